@@ -1,21 +1,35 @@
 """Main data collection script for AOM 2024 Entrepreneurship Language PDW presentation"""
 
-import time
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import pandas as pd
 
+import src.config as cfg
 import src.general as gen
 import src.crossref as crossref
 
 SCOPUS_DATA_FILE = gen.DATA_DIRECTORY / "scopus_download.parquet"
+HARVEST_STATE_FILE = gen.DATA_DIRECTORY / "harvest_state.json"
 
 
-def write_data_file(file_path: Path) -> bool:
-    """Verify file exists and prompt user to overwrite if it does"""
+def write_data_file(file_path: Path, overwrite: bool = False) -> bool:
+    """Verify file exists and prompt user to overwrite if it does
+
+    Args:
+        file_path (Path): Data file (or dataset directory)
+        overwrite (bool): Overwrite an existing file without asking. Defaults
+            to False.
+    """
     if not file_path.exists():
         return True
+    if overwrite:
+        print(f"Overwriting data file {file_path}")
+        return True
 
     while True:
         print(f"Data file {file_path} already exists. Overwrite? (y/n) > ", end="")
@@ -30,43 +44,160 @@ def write_data_file(file_path: Path) -> bool:
             print("Invalid response.")
 
 
-def get_scholars() -> List[dict]:
+def load_harvest_state() -> dict:
+    """Load the date each ISSN and scholar was last harvested
+
+    Returns:
+        dict: Last harvest dates (YYYY-MM-DD) under "ISSNs" and "Scholars"
+    """
+    if not HARVEST_STATE_FILE.exists():
+        return {"ISSNs": {}, "Scholars": {}}
+
+    with open(HARVEST_STATE_FILE, encoding="utf8") as infile:
+        return json.load(infile)
+
+
+def save_harvest_state(harvest_state: dict) -> None:
+    """Save the date each ISSN and scholar was last harvested
+
+    Args:
+        harvest_state (dict): Last harvest dates under "ISSNs" and "Scholars"
+    """
+    with open(HARVEST_STATE_FILE, "w", encoding="utf8") as outfile:
+        json.dump(harvest_state, outfile, indent=4)
+
+
+def upsert_works(
+    existing: pd.DataFrame, updates: pd.DataFrame, keys: List[str]
+) -> pd.DataFrame:
+    """Insert new works and replace updated ones
+
+    Args:
+        existing (pd.DataFrame): Previously collected works
+        updates (pd.DataFrame): Newly collected works
+        keys (List[str]): Columns identifying a work
+
+    Returns:
+        pd.DataFrame: Combined works, with updates taking precedence
+    """
+    return (
+        pd.concat([existing, updates], ignore_index=True)
+        .drop_duplicates(subset=keys, keep="last")
+        .reset_index(drop=True)
+    )
+
+
+def get_scholars() -> List[cfg.Scholar]:
     """Get list of scholars from settings.json
 
     Returns:
-        [dict]: List of scholars names and start years in dicts
+        [cfg.Scholar]: List of scholars names and start years
     """
 
-    settings = gen.get_settings()
-    assert "Scholars" in settings, "Scholars not in settings.json"
+    return list(cfg.get_config().scholars)
+
+
+def collect_scholar_data(
+    scholar: cfg.Scholar,
+    issns: Tuple[str, ...],
+    from_index_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """Collect one scholar's publications from Crossref API
 
-    return settings["Scholars"]
+    Args:
+        scholar (cfg.Scholar): Scholar name and start year from settings.json
+        issns (Tuple[str, ...]): ISSNs to collect the scholar's works from
+        from_index_date (Optional[str]): Only collect works indexed on or after
+            this date (YYYY-MM-DD). Defaults to None.
 
+    Returns:
+        pd.DataFrame: Scholar's publications
+    """
+    fname, lname = scholar.first_name, scholar.last_name
+    s_year = scholar.start_year
+    if not issns:
+        return crossref.parse_author_works_to_df(fname, lname, [])
+
+    pages = crossref.iter_works_by_name(fname, lname, s_year, issns, from_index_date)
+    author_data = crossref.parse_author_works_to_df(fname, lname, pages)
+    author_data["Abstract"] = crossref.remove_xml_from_abstracts(
+        author_data["Abstract"]
+    )
+    return author_data
 
-def collect_author_data(api_delay: int) -> pd.DataFrame:
-    """Collect author data from Crossref API and save to pickle file"""
 
-    if not write_data_file(gen.AUTHOR_DATA_FILE):
-        return pd.read_pickle(gen.AUTHOR_DATA_FILE)
+def collect_author_data(
+    max_workers: int,
+    incremental: bool,
+    harvest_state: dict,
+    journal_data: pd.DataFrame,
+    overwrite: bool = False,
+) -> pd.DataFrame:
+    """Collect author data from Crossref API and save to Parquet dataset
 
-    scholar_list = get_scholars()
-    author_data_list = []
+    Scholars' works in journals that were already collected for the journal
+    corpus are found in journal_data rather than requested again; only the
+    remaining ISSNs are searched with the API. This is skipped for scholars
+    whose start year is before the journal corpus' start year.
 
+    Args:
+        max_workers (int): Number of scholars to collect concurrently
+        incremental (bool): Only collect works indexed since each scholar was
+            last harvested and upsert them into the existing data
+        harvest_state (dict): Last harvest dates, updated in place
+        journal_data (pd.DataFrame): Collected journal data
+        overwrite (bool): Overwrite existing data without asking. Defaults to
+            False.
+    """
+
+    incremental = incremental and gen.AUTHOR_DATASET.exists()
+    if not incremental and not write_data_file(gen.AUTHOR_DATASET, overwrite):
+        return gen.load_author_data()
+
+    harvest_date = datetime.now(timezone.utc).date().isoformat()
+    scholar_list = get_scholars()
+    scholar_names = [f"{s.first_name} {s.last_name}" for s in scholar_list]
+    from_dates = [
+        harvest_state["Scholars"].get(name) if incremental else None
+        for name in scholar_names
+    ]
+
+    all_issns = tuple(crossref.get_issn_list())
+    journal_list, journal_start_year = get_journal_sample_frame()
+    local_issns = set()
+    if "Authors" in journal_data and journal_data["Authors"].notna().all():
+        local_issns = set(crossref.get_issn_list(journal_list))
+        local_matches = crossref.match_author_works_in_df(scholar_list, journal_data)
+
+    issn_lists = []
     for scholar in scholar_list:
-        fname, lname = scholar["first_name"], scholar["last_name"]
-        s_year = scholar["start_year"]
-        works = crossref.get_works_by_name(fname, lname, s_year)
-        author_data = crossref.parse_author_works_to_df(fname, lname, works)
-        author_data_list.append(author_data)
-        print(f"Collected {len(author_data)} publications for {fname} {lname}")
-        if api_delay:
-            print(f"Sleeping for {api_delay} seconds to avoid taxing API")
-            time.sleep(api_delay)
+        if local_issns and scholar.start_year >= journal_start_year:
+            issn_lists.append(tuple(i for i in all_issns if i not in local_issns))
+        else:
+            issn_lists.append(all_issns)
+
+    author_data_list = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            collect_scholar_data, scholar_list, issn_lists, from_dates
+        )
+        for i, (name, author_data) in enumerate(zip(scholar_names, results)):
+            if issn_lists[i] != all_issns:
+                author_data = pd.concat(
+                    [author_data, local_matches[i]], ignore_index=True
+                ).drop_duplicates("DOI")
+            author_data_list.append(author_data)
+            harvest_state["Scholars"][name] = harvest_date
+            print(f"Collected {len(author_data)} publications for {name}")
 
     author_data = pd.concat(author_data_list, ignore_index=True)
-    author_data["Abstract"] = author_data["Abstract"].apply(
-        crossref.remove_xml_from_abstract
-    )
+
+    if incremental:
+        author_data = upsert_works(
+            gen.load_author_data(),
+            author_data,
+            ["First_name", "Last_name", "DOI"],
+        )
     return author_data
 
 
@@ -78,45 +209,75 @@ def get_journal_sample_frame() -> Tuple[List[str], int]:
         int: Start year for sampling frame
     """
 
-    settings = gen.get_settings()
-    assert "Journal Pub Sample" in settings, "Journal Pub Sample not in settings.json"
-    sample = settings["Journal Pub Sample"]
+    config = cfg.get_config()
+
+    return (list(config.sample_journals), config.sample_start_year)
 
-    assert "journals" in sample, "journals not in Journal Pub Sample"
-    assert "start_year" in sample, "start_year not in Journal Pub Sample"
-    journal_list = sample["journals"]
-    start_year = sample["start_year"]
 
-    assert isinstance(journal_list, list), "journals must be a list"
-    assert isinstance(start_year, int), "start_year must be an integer"
+def collect_issn_data(
+    issn: str, start_year: int, from_index_date: Optional[str] = None
+) -> pd.DataFrame:
+    """Collect one journal's (ISSN's) publications from Crossref API
+
+    Args:
+        issn (str): Journal ISSN
+        start_year (int): Start year for sampling frame
+        from_index_date (Optional[str]): Only collect works indexed on or after
+            this date (YYYY-MM-DD). Defaults to None.
+
+    Returns:
+        pd.DataFrame: Journal's publications
+    """
+    pages = crossref.iter_works_by_issn(issn, start_year, from_index_date)
+    return crossref.parse_journal_works_to_df(pages)
 
-    return (journal_list, start_year)
 
+def collect_journal_data(
+    max_workers: int, incremental: bool, harvest_state: dict, overwrite: bool = False
+) -> pd.DataFrame:
+    """Collect journal data from Crossref API and save to Parquet dataset
 
-def collect_journal_data(api_delay: int) -> pd.DataFrame:
-    """Collect journal data from Crossref API and save to pickle file"""
+    Args:
+        max_workers (int): Number of ISSNs to collect concurrently
+        incremental (bool): Only collect works indexed since each ISSN was
+            last harvested and upsert them into the existing data
+        harvest_state (dict): Last harvest dates, updated in place
+        overwrite (bool): Overwrite existing data without asking. Defaults to
+            False.
+    """
 
-    if not write_data_file(gen.JOURNAL_DATA_FILE):
-        return pd.read_pickle(gen.JOURNAL_DATA_FILE)
+    incremental = incremental and gen.JOURNAL_DATASET.exists()
+    if not incremental and not write_data_file(gen.JOURNAL_DATASET, overwrite):
+        return gen.load_journal_data()
 
+    harvest_date = datetime.now(timezone.utc).date().isoformat()
     journal_list, start_year = get_journal_sample_frame()
 
     issn_list = crossref.get_issn_list(journal_list)
+    from_dates = [
+        harvest_state["ISSNs"].get(issn) if incremental else None
+        for issn in issn_list
+    ]
     journal_data_list = []
 
-    for issn in issn_list:
-        works = crossref.get_works_by_issn(issn, start_year)
-        journal_data = crossref.parse_journal_works_to_df(works)
-        journal_data_list.append(journal_data)
-        print(f"Collected {len(journal_data)} publications for journal {issn}")
-        if api_delay:
-            print(f"Sleeping for {api_delay} seconds to avoid taxing API")
-            time.sleep(api_delay)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            collect_issn_data, issn_list, [start_year] * len(issn_list), from_dates
+        )
+        for issn, journal_data in zip(issn_list, results):
+            journal_data_list.append(journal_data)
+            harvest_state["ISSNs"][issn] = harvest_date
+            print(f"Collected {len(journal_data)} publications for journal {issn}")
 
     journal_data = pd.concat(journal_data_list, ignore_index=True)
-    journal_data["Abstract"] = journal_data["Abstract"].apply(
-        crossref.remove_xml_from_abstract
+    journal_data["Abstract"] = crossref.remove_xml_from_abstracts(
+        journal_data["Abstract"]
     )
+
+    if incremental:
+        journal_data = upsert_works(
+            gen.load_journal_data(), journal_data, ["DOI"]
+        )
     return journal_data
 
 
@@ -144,20 +305,39 @@ def merge_w_scopus_data(df: pd.DataFrame, scopus_data: pd.DataFrame) -> pd.DataF
     return df
 
 
-def main(api_delay: int = 2) -> None:
+def main(
+    max_workers: int = crossref.MAX_WORKERS,
+    incremental: bool = False,
+    overwrite: bool = False,
+) -> None:
     """Main data collection function
 
+    Requests are rate limited in src.crossref to stay within Crossref's polite
+    pool limits, so no fixed delay between API calls is needed.
+
     Args:
-        api_delay (int, optional): Delay in seconds between API calls. Defaults to
-            2.
+        max_workers (int, optional): Number of scholars/journals to collect
+            concurrently. Defaults to crossref.MAX_WORKERS.
+        incremental (bool, optional): Only collect works indexed since the last
+            harvest and upsert them into the existing data files. Defaults to
+            False.
+        overwrite (bool, optional): Overwrite existing data files without
+            asking. Defaults to False.
     """
 
-    # Collect samples from Crossref API
-    print("=====Author Data Collection=====")
-    author_data = collect_author_data(api_delay)
+    harvest_state = load_harvest_state()
 
+    # Collect samples from Crossref API
+    # Journals first, so scholars' works in those journals can be found locally
     print("=====Journal Data Collection=====")
-    journal_data = collect_journal_data(api_delay)
+    journal_data = collect_journal_data(
+        max_workers, incremental, harvest_state, overwrite
+    )
+
+    print("=====Author Data Collection=====")
+    author_data = collect_author_data(
+        max_workers, incremental, harvest_state, journal_data, overwrite
+    )
 
     # Fill in missing abstract data where possible using Scopus data
     # Requires manual intervention from user beyond the scope of this repository
@@ -187,10 +367,24 @@ def main(api_delay: int = 2) -> None:
 
     print("=====Saving data files to disk=====")
     gen.save_data_files(author_data, journal_data)
+    save_harvest_state(harvest_state)
+    crossref.clear_checkpoints()
 
     print("*****Processing complete*****")
     print(f"Data files saved to {gen.DATA_DIRECTORY}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only collect works added or updated since the last run",
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="overwrite existing data files without asking",
+    )
+    args = parser.parse_args()
+    main(incremental=args.incremental, overwrite=args.yes)
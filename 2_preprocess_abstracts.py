@@ -1,13 +1,83 @@
 """Preprocesses the abstracts"""
 
-import spacy
-from gensim.models.phrases import Phrases
+from pathlib import Path
+from typing import List, Tuple
+
+import pandas as pd
 
 import src.general as gen
 import src.preprocessing as pp
 
 AUTHOR_PHRASE_MODEL = gen.DATA_DIRECTORY / "author_phrases.model"
 JOURNAL_PHRASE_MODEL = gen.DATA_DIRECTORY / "journal_phrases.model"
+NONCONTENT_HITS_FILE = gen.OUTPUT_DIRECTORY / "noncontent_regex_hits.csv"
+EXCLUDED_ARTICLES_FILE = gen.OUTPUT_DIRECTORY / "excluded_articles.csv"
+
+
+def drop_excluded_articles(
+    author_data: pd.DataFrame, journal_data: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Drop withdrawn/retracted/errata/etc. articles from both corpora
+
+    Titles are checked once across both corpora (many articles are in both),
+    and each dropped article is saved, with the term that excluded it, to
+    EXCLUDED_ARTICLES_FILE.
+
+    Args:
+        author_data (pd.DataFrame): Author data
+        journal_data (pd.DataFrame): Journal data
+
+    Returns:
+        pd.DataFrame: Author data without excluded articles
+        pd.DataFrame: Journal data without excluded articles
+    """
+
+    titles = pd.concat([author_data["Title"], journal_data["Title"]]).unique()
+    reasons = pd.Series(
+        pp.get_title_exclusion_reasons(pd.Series(titles)).to_numpy(), index=titles
+    ).dropna()
+
+    author_reasons = author_data["Title"].map(reasons)
+    journal_reasons = journal_data["Title"].map(reasons)
+
+    excluded = pd.concat(
+        [
+            author_data.loc[author_reasons.notna(), ["DOI", "Title"]]
+            .assign(Corpus="author", Reason=author_reasons.dropna())
+            .drop_duplicates("DOI"),
+            journal_data.loc[journal_reasons.notna(), ["DOI", "Title"]]
+            .assign(Corpus="journal", Reason=journal_reasons.dropna()),
+        ],
+        ignore_index=True,
+    )
+    excluded.to_csv(EXCLUDED_ARTICLES_FILE, index=False)
+    print(f"Dropped {len(excluded)} articles, see {EXCLUDED_ARTICLES_FILE}")
+
+    return (
+        author_data[author_reasons.isna()],
+        journal_data[journal_reasons.isna()],
+    )
+
+
+def add_bigrams(
+    data: pd.DataFrame, preprocessed: List[List[str]], phrase_model_file: Path
+) -> None:
+    """Train a corpus' phrase model and add its bigram columns
+
+    Args:
+        data (pd.DataFrame): Corpus data, updated in place
+        preprocessed (List[List[str]]): Preprocessed tokens for each row
+        phrase_model_file (Path): Where to save the frozen phrase model
+    """
+
+    phrases = pp.train_phrases(preprocessed)
+    phrases.save(str(phrase_model_file))
+
+    data["Abstract_preprocessed"] = preprocessed
+    data["Abstract_w_bigrams"] = list(
+        pp.apply_phrases(phrases, preprocessed, pp.N_PROCESS)
+    )
+    data["Abstract_bigram_ws"] = data["Abstract_w_bigrams"].str.join(" ")
 
 
 def main() -> None:
@@ -17,22 +87,7 @@ def main() -> None:
     author_data, journal_data = gen.load_data_files()
 
     print("=====Dropping Withdrawn/retracted/Errata/etc. articles=====")
-    for word in [
-        "withdrawn",
-        "retracted",
-        "errata",
-        "correction",
-        "retraction",
-        "editorial",
-        "issue information",
-        "journal information",
-    ]:
-        author_data = author_data[
-            ~author_data["Title"].str.lower().str.contains(word, case=False)
-        ]
-        journal_data = journal_data[
-            ~journal_data["Title"].str.lower().str.contains(word, case=False)
-        ]
+    author_data, journal_data = drop_excluded_articles(author_data, journal_data)
 
     print("=====Dropping duplicate articles=====")
     # Drop duplicates based on DOI but only for journal corpus
@@ -41,12 +96,21 @@ def main() -> None:
     journal_data = journal_data.drop_duplicates(subset="DOI")
 
     print("=====Cleaning abstracts to remove non-content statements=====")
-    author_data["Abstract_clean"] = pp.remove_noncontent_statements(
-        author_data["Abstract"]
-    ).astype(str)
-    journal_data["Abstract_clean"] = pp.remove_noncontent_statements(
-        journal_data["Abstract"]
-    ).astype(str)
+    # Abstracts in both corpora (or shared by coauthors) are only cleaned once
+    abstracts = (
+        pd.concat([author_data["Abstract"], journal_data["Abstract"]])
+        .dropna()
+        .drop_duplicates()
+    )
+    cleaned, noncontent_hits = pp.clean_noncontent_statements(abstracts)
+    cleaned = pd.Series(cleaned.to_numpy(), index=abstracts.to_numpy())
+    author_data["Abstract_clean"] = author_data["Abstract"].map(cleaned)
+    journal_data["Abstract_clean"] = journal_data["Abstract"].map(cleaned)
+
+    noncontent_hits.to_csv(NONCONTENT_HITS_FILE, index=False)
+    n_fired = (noncontent_hits["Matches"] > 0).sum()
+    print(f"{n_fired} of {len(noncontent_hits)} regexes removed text")
+    print(f"Regex hit counts saved to {NONCONTENT_HITS_FILE}")
 
     print("=====Dropping articles with no abstracts=====")
     author_data = author_data[author_data["Abstract_clean"].notna()]
@@ -60,39 +124,22 @@ def main() -> None:
     gen.check_download_models()
 
     print("=====Preprocessing corpora=====")
-    nlp = spacy.load("en_core_web_sm")
-
-    print(">> Author corpus...")
     author_data["Full_name"] = (
         author_data["First_name"] + " " + author_data["Last_name"]
     )
-    author_abstracts_list = author_data["Abstract_clean"].tolist()
-    author_docs = list(nlp.pipe(author_abstracts_list))
-    author_data["Abstract_clean"] = [doc.text for doc in author_docs]
-    author_preprocessed = pp.preprocess_docs(author_docs, True, True, True)
-    author_data["Abstract_preprocessed"] = author_preprocessed
-    author_phrases = Phrases(author_preprocessed, min_count=3, threshold=10)
-    author_phrases.save(str(AUTHOR_PHRASE_MODEL))
-    author_data["Abstract_w_bigrams"] = author_data["Abstract_preprocessed"].apply(
-        lambda x: author_phrases[x]
-    )
-    author_data["Abstract_bigram_ws"] = author_data["Abstract_w_bigrams"].str.join(" ")
-
-    print(">> Journal corpus...")
-    journal_abstracts_list = journal_data["Abstract_clean"].tolist()
-    journal_docs = list(nlp.pipe(journal_abstracts_list))
-    journal_data["Abstract_clean"] = [doc.text for doc in journal_docs]
-    journal_preprocessed = pp.preprocess_docs(journal_docs, True, True, True)
-    journal_data["Abstract_preprocessed"] = journal_preprocessed
-    journal_phrases = Phrases(journal_preprocessed, min_count=3, threshold=10)
-    journal_phrases.save(str(JOURNAL_PHRASE_MODEL))
-    journal_data["Abstract_w_bigrams"] = journal_data["Abstract_preprocessed"].apply(
-        lambda x: journal_phrases[x]
-    )
-    journal_data["Abstract_bigram_ws"] = journal_data["Abstract_w_bigrams"].str.join(
-        " "
+    author_preprocessed, journal_preprocessed = pp.preprocess_corpora(
+        [author_data["Abstract_clean"], journal_data["Abstract_clean"]],
+        True,
+        True,
+        True,
     )
 
+    # Each corpus keeps its own phrase model
+    print(">> Author corpus bigrams...")
+    add_bigrams(author_data, author_preprocessed, AUTHOR_PHRASE_MODEL)
+    print(">> Journal corpus bigrams...")
+    add_bigrams(journal_data, journal_preprocessed, JOURNAL_PHRASE_MODEL)
+
     print("=====Saving data files to disk=====")
     gen.save_data_files(author_data, journal_data)
 
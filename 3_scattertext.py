@@ -1,80 +1,48 @@
 """Runs scattertext on the cleaned abstracts"""
 
-import pandas as pd
+import argparse
+
 import scattertext as st
 
+import src.associations as assoc
+import src.citations as citations
 import src.general as gen
+import src.reports as reports
 
 
 def one_vs_rest_authors(author_data) -> None:
     """Run one-vs-rest Scattertext analysis for authors"""
 
-    corpus = (
-        st.CorpusFromPandas(
-            author_data,
-            category_col="Full_name",
-            text_col="Abstract_bigram_ws",
-            nlp=st.whitespace_nlp,
-        )
-        .build()
-        .compact(st.AssociationCompactor(2000))
-    )
-
-    for author in author_data["Full_name"].unique():
-        print(f">>>> {author}")
-        html = st.produce_scattertext_explorer(
-            corpus,
-            category=author,
-            category_name=author,
-            not_category_name="Other Authors",
-            minimum_term_frequency=2,
-            pmi_filter_thresold=4,
-            transform=st.Scalers.dense_rank,
-            width_in_pixels=1000,
-            metadata=author_data["Title"],
-            include_gradient=True,
-            left_gradient_term=f"Less like {author}",
-            right_gradient_term=f"More like {author}",
-        )
+    corpus = reports.get_corpus(author_data, "Full_name")
 
-        output_file = gen.OUTPUT_DIRECTORY / f"{author}_scattertext.html"
-        with open(output_file, "wb") as outfile:
-            outfile.write(html.encode("utf-8"))
+    reports.render_one_vs_rest(
+        corpus,
+        list(author_data["Full_name"].unique()),
+        "Other Authors",
+        minimum_term_frequency=2,
+        pmi_filter_thresold=4,
+        transform=st.Scalers.dense_rank,
+        width_in_pixels=1000,
+        metadata=author_data["Title"],
+        include_gradient=True,
+    )
 
 
 def one_vs_rest_journals(journal_data) -> None:
     """Run one-vs-rest Scattertext analysis for journals"""
 
-    corpus = (
-        st.CorpusFromPandas(
-            journal_data,
-            category_col="Journal",
-            text_col="Abstract_bigram_ws",
-            nlp=st.whitespace_nlp,
-        )
-        .build()
-        .compact(st.AssociationCompactor(2000))
-    )
-
-    for journal in journal_data["Journal"].unique():
-        print(f">>>> {journal}")
-        html = st.produce_scattertext_explorer(
-            corpus,
-            category=journal,
-            category_name=journal,
-            not_category_name="Other Journals",
-            minimum_term_frequency=20,
-            pmi_filter_thresold=4,
-            transform=st.Scalers.dense_rank,
-            width_in_pixels=1000,
-            include_gradient=True,
-            left_gradient_term=f"Less like {journal}",
-            right_gradient_term=f"More like {journal}",
-        )
+    corpus = reports.get_corpus(journal_data, "Journal")
 
-        output_file = gen.OUTPUT_DIRECTORY / f"{journal}_scattertext.html"
-        with open(output_file, "wb") as outfile:
-            outfile.write(html.encode("utf-8"))
+    reports.render_one_vs_rest(
+        corpus,
+        list(journal_data["Journal"].unique()),
+        "Other Journals",
+        minimum_term_frequency=20,
+        pmi_filter_thresold=4,
+        transform=st.Scalers.dense_rank,
+        width_in_pixels=1000,
+        include_gradient=True,
+    )
 
 
 def citation_extremes(journal_data) -> None:
@@ -83,36 +51,25 @@ def citation_extremes(journal_data) -> None:
     # No citations yet for 2024 articles
     journal_data = journal_data[journal_data["Pub Date"] < 2024]
 
-    def get_most_least_cited(group) -> pd.DataFrame:
-        threshold = group["Citations"].quantile(0.80)
-        group["Most_cited"] = group["Citations"].apply(
-            lambda x: "high" if x >= threshold else "not"
-        )
-        threshold = group["Citations"].quantile(0.20)
-        group["Least_cited"] = group["Citations"].apply(
-            lambda x: "low" if x <= threshold else "not"
-        )
-        return group
-
-    journal_data = (
-        journal_data.groupby("Pub Date")
-        .apply(get_most_least_cited)
-        .reset_index(drop=True)
+    journal_data = journal_data.assign(
+        Most_cited=citations.label_top(journal_data, 0.80, "high"),
+        Least_cited=citations.label_bottom(journal_data, 0.20, "low"),
     )
 
-    corpus = (
-        st.CorpusFromPandas(
-            journal_data,
-            category_col="Most_cited",
-            text_col="Abstract_bigram_ws",
-            nlp=st.whitespace_nlp,
-        )
-        .build()
-        .compact(st.AssociationCompactor(2000, use_non_text_features=False))
+    # One term-document matrix for both labelings; only the categories differ
+    def build_cited_corpus() -> st.Corpus:
+        return reports.get_corpus(journal_data, "Most_cited", max_terms=None)
+
+    corpus = reports.get_corpus(
+        journal_data,
+        "Most_cited",
+        use_non_text_features=False,
+        build=build_cited_corpus,
     )
 
-    html = st.produce_scattertext_explorer(
+    reports.render_scattertext(
         corpus,
+        gen.OUTPUT_DIRECTORY / "Most_cited_scattertext.html",
         category="high",
         category_name="Most Cited",
         not_category_name="Not Most Cited",
@@ -125,23 +82,18 @@ def citation_extremes(journal_data) -> None:
         right_gradient_term="More likely to be most cited",
     )
 
-    output_file = gen.OUTPUT_DIRECTORY / "Most_cited_scattertext.html"
-    with open(output_file, "wb") as outfile:
-        outfile.write(html.encode("utf-8"))
-
-    corpus = (
-        st.CorpusFromPandas(
-            journal_data,
-            category_col="Least_cited",
-            text_col="Abstract_bigram_ws",
-            nlp=st.whitespace_nlp,
-        )
-        .build()
-        .compact(st.AssociationCompactor(2000, use_non_text_features=False))
+    corpus = reports.get_corpus(
+        journal_data,
+        "Least_cited",
+        use_non_text_features=False,
+        build=lambda: build_cited_corpus().recategorize(
+            journal_data["Least_cited"].tolist()
+        ),
     )
 
-    html = st.produce_scattertext_explorer(
+    reports.render_scattertext(
         corpus,
+        gen.OUTPUT_DIRECTORY / "Least_cited_scattertext.html",
         category="low",
         category_name="Least Cited",
         not_category_name="Not Least Cited",
@@ -153,16 +105,43 @@ def citation_extremes(journal_data) -> None:
         right_gradient_term="More likely to be most cited",
     )
 
-    output_file = gen.OUTPUT_DIRECTORY / "Least_cited_scattertext.html"
-    with open(output_file, "wb") as outfile:
-        outfile.write(html.encode("utf-8"))
 
+def term_association_tables(author_data, journal_data) -> None:
+    """Save one-vs-rest term association tables for authors and journals"""
+
+    for name, data, category_col in [
+        ("author", author_data, "Full_name"),
+        ("journal", journal_data, "Journal"),
+    ]:
+        associations = assoc.get_term_associations(
+            data["Abstract_bigram_ws"], data[category_col]
+        )
+        parquet_file, json_file = assoc.save_term_associations(associations, name)
+        print(f">>>> {parquet_file.name}, {json_file.name}")
+
+
+def main(associations_only: bool = False) -> None:
+    """Main function for scattertext analysis
 
-def main() -> None:
-    """Main function for scattertext analysis"""
+    Args:
+        associations_only (bool, optional): Only save the term association
+            tables, not the scattertext HTML files. Defaults to False.
+    """
 
     print("=====Loading data files into memory=====")
-    author_data, journal_data = gen.load_data_files()
+    author_data = gen.load_author_data(
+        columns=["Full_name", "Title", "Abstract_bigram_ws"]
+    )
+    journal_data = gen.load_journal_data(
+        columns=["Journal", "Pub Date", "Citations", "Abstract_bigram_ws"]
+    )
+
+    print("=====Saving term association tables=====")
+    term_association_tables(author_data, journal_data)
+    if associations_only:
+        print("*****Processing complete*****")
+        print(f"Term association tables saved to {gen.OUTPUT_DIRECTORY}")
+        return
 
     print("=====Running scattertext analyses=====")
     print(">> Authors...")
@@ -177,4 +156,11 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--associations-only",
+        action="store_true",
+        help="only save the term association tables (no scattertext HTML)",
+    )
+    args = parser.parse_args()
+    main(args.associations_only)
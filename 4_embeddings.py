@@ -1,51 +1,55 @@
-import sys
+"""Embeds the journal abstracts and compares them to the test abstracts/query"""
 
-import ollama
+import argparse
+import sys
+from typing import Optional
 
 import src.general as gen
 import src.embeddings as emb
 
 
-def main() -> None:
-    """Main function for embedding functions"""
+def main(vectordb: Optional[str] = None) -> None:
+    """Main function for embedding functions
+
+    Args:
+        vectordb (Optional[str]): "reset", "sync" or "use" the vector
+            database. Defaults to None (ask if the vector database exists,
+            otherwise sync).
+    """
 
     print("=====Initializing vector database directory=====")
-    if emb.VECTORDB_DIRECTORY.exists():
+    if vectordb:
+        response = vectordb[0]
+    elif emb.VECTORDB_DIRECTORY.exists():
         while True:
             response = input(
-                "Vector database already exists. [R]eset or [U]se as-is? (r/u): "
+                "Vector database already exists. "
+                "[R]eset, [S]ync with data files, or [U]se as-is? (r/s/u): "
             )
-            if response.lower() in ["r", "u"]:
+            if response.lower() in ["r", "s", "u"]:
                 break
-            print("Invalid response. Please enter 'r' or 'u'\n")
-
-        if response.lower() == "r":
-            emb.delete_vectordb_directory()
+            print("Invalid response. Please enter 'r', 's' or 'u'\n")
     else:
-        response = "r"
+        response = "s"
+
+    if response.lower() == "r":
+        emb.delete_vectordb_directory()
     emb.create_vectordb_directory()
 
     print("=====Getting Ollama model=====")
     model = emb.get_ollama_model()
     if not emb.ollama_is_ready(model):
-        sys.exit()
+        sys.exit(1)
 
     print("=====Loading datafiles=====")
-    _, journal_data = gen.load_data_files()
-
-    print("=====Dropping unneeded columns=====")
-    journal_data = journal_data.drop(
-        columns=[
-            "Abstract",
-            "Abstract_preprocessed",
-            "Abstract_w_bigrams",
-            "Abstract_bigram_ws",
-        ]
+    # Only the cleaned abstracts and the columns used as document metadata
+    journal_data = gen.load_journal_data(
+        columns=["DOI", "Title", "Journal", "Pub Date", "Citations", "Abstract_clean"]
     )
 
-    if response.lower() == "r":
-        print("=====Creating vector database=====")
-        db = emb.create_vectordb(journal_data, model)
+    if response.lower() in ["r", "s"]:
+        print("=====Syncing vector database with data files=====")
+        db = emb.sync_vectordb(journal_data, model)
     else:
         print("=====Loading vector database=====")
         db = emb.load_vectordb(model)
@@ -65,9 +69,7 @@ def main() -> None:
         else:
             print()
         print("----------------Embedding Vector---------------")
-        test_embedding = ollama.embeddings(model=model, prompt=test_abstract)[
-            "embedding"
-        ]
+        test_embedding = emb.get_embedding(model, test_abstract)
         rounded_embedding = [round(x, 2) for x in test_embedding]
         print(rounded_embedding[:50], "...")
         print("---------------Cosine Similarity---------------")
@@ -77,29 +79,23 @@ def main() -> None:
             )
             print(f"{i+1}. {journal} - {similarity:.4f}")
         print("-------------Most similar articles-------------")
-        most_similar = db.similarity_search_by_vector(test_embedding, k=5)
-        for i, doc in enumerate(most_similar):
-            doc_embedding = ollama.embeddings(model=model, prompt=doc.page_content)[
-                "embedding"
-            ]
-            similarity = emb.get_cosine_similarity(test_embedding, doc_embedding)
-            print(f"{i+1}. {doc.metadata['Title']} - {similarity:.4f}")
+        most_similar = emb.search_vectordb(db, test_embedding, k=5)
+        for i, (title, similarity) in enumerate(
+            zip(most_similar["Title"], most_similar["Similarity"])
+        ):
+            print(f"{i+1}. {title} - {similarity:.4f}")
     print("\n*******************Test Query******************")
     print(test_query)
     print("----------------Embedding Vector---------------")
-    test_query_embedding = ollama.embeddings(model=model, prompt=test_query)[
-        "embedding"
-    ]
+    test_query_embedding = emb.get_embedding(model, test_query)
     rounded_query_embedding = [round(x, 2) for x in test_query_embedding]
     print(rounded_query_embedding[:50], "...")
     print("-------------Top Articles by Query-------------")
-    top_articles = db.similarity_search_by_vector(test_query_embedding, k=5)
-    for i, doc in enumerate(top_articles):
-        doc_embedding = ollama.embeddings(model=model, prompt=doc.page_content)[
-            "embedding"
-        ]
-        similarity = emb.get_cosine_similarity(test_query_embedding, doc_embedding)
-        print(f"{i+1}. {doc.metadata['Title']} - {similarity:.4f}")
+    top_articles = emb.search_vectordb(db, test_query_embedding, k=5)
+    for i, (title, similarity) in enumerate(
+        zip(top_articles["Title"], top_articles["Similarity"])
+    ):
+        print(f"{i+1}. {title} - {similarity:.4f}")
     print("\n***********************************************")
     print("*           Visualizing Embeddings            *")
     print("***********************************************")
@@ -113,4 +109,11 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--vectordb",
+        choices=["reset", "sync", "use"],
+        help="reset, sync or use the vector database without asking",
+    )
+    args = parser.parse_args()
+    main(args.vectordb)
@@ -0,0 +1,357 @@
+"""Runs the numbered scripts as a pipeline, skipping stages that are up to date
+
+Each stage's token is a hash of its inputs (the settings it reads, its script,
+the src/ modules it imports, any extra input files) and the tokens of the stages
+it depends on. A stage is run only if its token changed since it last
+succeeded, the datasets it reads changed since then (e.g., after running
+1_collect_data.py by hand), one of its outputs is missing, or a stage it
+depends on was run. Stages that don't
+depend on each other (scattertext and embeddings) are run in parallel.
+"""
+
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import src.config as cfg
+import src.general as gen
+
+ROOT_DIRECTORY = Path(__file__).parent
+SRC_DIRECTORY = ROOT_DIRECTORY / "src"
+PIPELINE_STATE_FILE = gen.DATA_DIRECTORY / "pipeline_state.json"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Pipeline stage run as a script"""
+
+    name: str
+    script: str
+    # src/ modules the script imports, directly or through other modules
+    modules: Tuple[str, ...] = ()
+    # Config fields (see src.config) the script reads
+    settings_keys: Tuple[str, ...] = ()
+    args: Tuple[str, ...] = ()
+    depends_on: Tuple[str, ...] = ()
+    inputs: Tuple[Path, ...] = ()
+    # Datasets the script reads, fingerprinted when it runs
+    datasets: Tuple[Path, ...] = ()
+    outputs: Tuple[Path, ...] = ()
+
+
+STAGES = (
+    Stage(
+        "collect",
+        "1_collect_data.py",
+        modules=("config", "general", "crossref"),
+        settings_keys=("scholars", "issns", "sample_journals", "sample_start_year"),
+        args=("--yes",),
+        inputs=(gen.DATA_DIRECTORY / "scopus_download.parquet",),
+        outputs=(gen.AUTHOR_DATASET, gen.JOURNAL_DATASET),
+    ),
+    Stage(
+        "preprocess",
+        "2_preprocess_abstracts.py",
+        modules=("config", "general", "preprocessing"),
+        settings_keys=(
+            "custom_stopwords",
+            "excluded_title_terms",
+            "noncontent_regexes",
+        ),
+        depends_on=("collect",),
+        datasets=(gen.AUTHOR_DATASET, gen.JOURNAL_DATASET),
+        outputs=(
+            gen.DATA_DIRECTORY / "author_phrases.model",
+            gen.DATA_DIRECTORY / "journal_phrases.model",
+        ),
+    ),
+    Stage(
+        "scattertext",
+        "3_scattertext.py",
+        modules=("config", "general", "associations", "citations", "reports"),
+        depends_on=("preprocess",),
+        datasets=(gen.AUTHOR_DATASET, gen.JOURNAL_DATASET),
+        outputs=(gen.OUTPUT_DIRECTORY / "Most_cited_scattertext.html",),
+    ),
+    Stage(
+        "embeddings",
+        "4_embeddings.py",
+        modules=("config", "general", "embeddings", "embedding_cache", "ollama_client"),
+        settings_keys=("ollama_model", "test_abstracts", "test_query"),
+        args=("--vectordb", "sync"),
+        depends_on=("preprocess",),
+        datasets=(gen.JOURNAL_DATASET,),
+        outputs=(
+            gen.DATA_DIRECTORY / "vectordb",
+            gen.OUTPUT_DIRECTORY / "tsne_scatterplot.html",
+        ),
+    ),
+)
+
+PRINT_LOCK = threading.Lock()
+
+
+def load_pipeline_state() -> Dict[str, dict]:
+    """Load the token of each stage's last successful run
+
+    Returns:
+        Dict[str, dict]: "token" and "finished" (ISO time) for each stage
+    """
+    if not PIPELINE_STATE_FILE.exists():
+        return {}
+
+    with open(PIPELINE_STATE_FILE, encoding="utf8") as infile:
+        return json.load(infile)
+
+
+def save_pipeline_state(pipeline_state: Dict[str, dict]) -> None:
+    """Save the token of each stage's last successful run
+
+    Args:
+        pipeline_state (Dict[str, dict]): "token" and "finished" for each stage
+    """
+    with open(PIPELINE_STATE_FILE, "w", encoding="utf8") as outfile:
+        json.dump(pipeline_state, outfile, indent=4)
+
+
+def hash_file(file_path: Path) -> str:
+    """Get the hash of a file's contents ("missing" if it doesn't exist)
+
+    Args:
+        file_path (Path): File
+
+    Returns:
+        str: Hex digest of the file
+    """
+    if not file_path.is_file():
+        return "missing"
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_dataset(dataset: Path) -> str:
+    """Get a fingerprint of a dataset from its files' names, sizes and mtimes
+
+    Args:
+        dataset (Path): Dataset directory
+
+    Returns:
+        str: Hex digest of the dataset's file listing ("missing" if it doesn't
+            exist)
+    """
+    if not dataset.is_dir():
+        return "missing"
+
+    digest = hashlib.sha256()
+    for file_path in sorted(dataset.rglob("*")):
+        if file_path.is_file():
+            stat = file_path.stat()
+            name = file_path.relative_to(dataset).as_posix()
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf8"))
+    return digest.hexdigest()
+
+
+def get_run_token(stage: Stage, token: str) -> str:
+    """Combine a stage's token with the current fingerprints of its datasets
+
+    This is what is saved when a stage succeeds, so a dataset changed by
+    anything other than the stage itself (e.g., running 1_collect_data.py by
+    hand) makes the stage out of date.
+
+    Args:
+        stage (Stage): Stage
+        token (str): Stage's token (see get_stage_tokens)
+
+    Returns:
+        str: Token including the dataset fingerprints
+    """
+    if not stage.datasets:
+        return token
+
+    digest = hashlib.sha256(token.encode("utf8"))
+    for dataset in stage.datasets:
+        digest.update(f"{dataset.name}:{fingerprint_dataset(dataset)};".encode("utf8"))
+    return digest.hexdigest()
+
+
+def get_stage_tokens() -> Dict[str, str]:
+    """Get each stage's token from its inputs and upstream stages' tokens
+
+    Returns:
+        Dict[str, str]: Token for each stage
+    """
+
+    config = cfg.get_config()
+    tokens: Dict[str, str] = {}
+    for stage in STAGES:
+        digest = hashlib.sha256()
+        for key in stage.settings_keys:
+            digest.update(f"{key}:{getattr(config, key)!r};".encode("utf8"))
+        files = (
+            [ROOT_DIRECTORY / stage.script]
+            + [SRC_DIRECTORY / f"{module}.py" for module in stage.modules]
+            + list(stage.inputs)
+        )
+        for file_path in files:
+            digest.update(f"{file_path.relative_to(ROOT_DIRECTORY)}:".encode("utf8"))
+            digest.update(hash_file(file_path).encode("utf8"))
+        digest.update(" ".join(stage.args).encode("utf8"))
+        for upstream in stage.depends_on:
+            digest.update(tokens[upstream].encode("utf8"))
+        tokens[stage.name] = digest.hexdigest()
+
+    return tokens
+
+
+def run_stage(stage: Stage) -> bool:
+    """Run a stage's script, prefixing its output with the stage name
+
+    Args:
+        stage (Stage): Stage to run
+
+    Returns:
+        bool: True if the script succeeded, False otherwise
+    """
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u", stage.script, *stage.args],
+        cwd=ROOT_DIRECTORY,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf8",
+        errors="replace",
+    )
+    for line in process.stdout:
+        with PRINT_LOCK:
+            print(f"[{stage.name}] {line}", end="")
+    process.wait()
+
+    elapsed = time.perf_counter() - start
+    status = "finished" if process.returncode == 0 else "FAILED"
+    with PRINT_LOCK:
+        print(f"[{stage.name}] {status} in {elapsed:.1f} seconds")
+    return process.returncode == 0
+
+
+def main(force: List[str], incremental: bool = False, dry_run: bool = False) -> int:
+    """Run the stages that aren't up to date
+
+    Args:
+        force (List[str]): Stages to run even if they are up to date
+        incremental (bool, optional): Collect only works added or updated since
+            the last run (always runs the collect stage). Defaults to False.
+        dry_run (bool, optional): Only print which stages would run. Defaults to
+            False.
+
+    Returns:
+        int: Exit code (1 if any stage failed)
+    """
+
+    pipeline_state = load_pipeline_state()
+    tokens = get_stage_tokens()
+    stages = {stage.name: stage for stage in STAGES}
+    if incremental:
+        stages["collect"] = replace(
+            stages["collect"], args=stages["collect"].args + ("--incremental",)
+        )
+        force = force + ["collect"]
+
+    to_run = set()
+    for stage in stages.values():
+        reasons = []
+        if stage.name in force:
+            reasons.append("forced")
+        if pipeline_state.get(stage.name, {}).get("token") != get_run_token(
+            stage, tokens[stage.name]
+        ):
+            reasons.append("inputs changed")
+        if not all(output.exists() for output in stage.outputs):
+            reasons.append("outputs missing")
+        if any(upstream in to_run for upstream in stage.depends_on):
+            reasons.append("upstream stage ran")
+        if reasons:
+            to_run.add(stage.name)
+            print(f"{stage.name}: run ({', '.join(reasons)})")
+        else:
+            print(f"{stage.name}: up to date")
+
+    if dry_run or not to_run:
+        return 0
+
+    # Run every stage whose upstream stages are done, in waves
+    done = {name for name in stages if name not in to_run}
+    failed = set()
+    while to_run:
+        ready = [
+            stages[name]
+            for name in sorted(to_run)
+            if all(upstream in done for upstream in stages[name].depends_on)
+        ]
+        blocked = [
+            name
+            for name in to_run
+            if any(upstream in failed for upstream in stages[name].depends_on)
+        ]
+        for name in blocked:
+            print(f"{name}: skipped (upstream stage failed)")
+            to_run.remove(name)
+            failed.add(name)
+        if not ready:
+            continue
+
+        print(f"=====Running {', '.join(stage.name for stage in ready)}=====")
+        with ThreadPoolExecutor(max_workers=len(ready)) as executor:
+            results = list(executor.map(run_stage, ready))
+
+        for stage, succeeded in zip(ready, results):
+            to_run.remove(stage.name)
+            if succeeded:
+                done.add(stage.name)
+                pipeline_state[stage.name] = {
+                    "token": get_run_token(stage, tokens[stage.name]),
+                    "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                save_pipeline_state(pipeline_state)
+            else:
+                failed.add(stage.name)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        default=[],
+        choices=[stage.name for stage in STAGES] + ["all"],
+        help="run these stages even if they are up to date",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="collect only works added or updated since the last run",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print which stages would run",
+    )
+    args = parser.parse_args()
+    forced = [stage.name for stage in STAGES] if "all" in args.force else args.force
+    sys.exit(main(forced, args.incremental, args.dry_run))
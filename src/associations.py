@@ -0,0 +1,186 @@
+"""One-vs-rest term associations without rendering scattertext HTML"""
+
+import json
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import norm
+from sklearn.feature_extraction.text import CountVectorizer
+
+import src.general as gen
+
+MIN_TERM_FREQUENCY = 2
+TOP_TERMS = 50
+
+
+def build_term_matrix(texts: pd.Series) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Build a document-term count matrix from whitespace tokenized texts
+
+    Args:
+        texts (pd.Series): Texts with tokens separated by whitespace (e.g.,
+            Abstract_bigram_ws)
+
+    Returns:
+        sparse.csr_matrix: Term counts (documents x terms)
+        np.ndarray: Terms (the matrix's columns)
+    """
+
+    vectorizer = CountVectorizer(
+        tokenizer=str.split, token_pattern=None, lowercase=False
+    )
+    matrix = vectorizer.fit_transform(texts)
+
+    return matrix.tocsr(), vectorizer.get_feature_names_out()
+
+
+def normcdf(scores: np.ndarray) -> np.ndarray:
+    """Scale each row with the normal CDF of its mean and standard deviation"""
+
+    mean = scores.mean(axis=1, keepdims=True)
+    std = scores.std(axis=1, keepdims=True)
+    return norm.cdf(scores, mean, np.where(std > 0, std, 1))
+
+
+def get_scaled_f_scores(
+    cat_counts: np.ndarray, not_cat_counts: np.ndarray
+) -> np.ndarray:
+    """Get each term's scaled F-score for each category (see scattertext)
+
+    The score is the harmonic mean of the normal CDF scaled precision (share of
+    a term's uses in the category) and frequency (share of the category's
+    words that are the term).
+
+    Args:
+        cat_counts (np.ndarray): Term counts in each category (categories x
+            terms)
+        not_cat_counts (np.ndarray): Term counts outside each category
+
+    Returns:
+        np.ndarray: Scaled F-scores (categories x terms), from 0 to 1
+    """
+
+    totals = cat_counts + not_cat_counts
+    precision = np.divide(
+        cat_counts, totals, out=np.zeros_like(cat_counts), where=totals > 0
+    )
+    cat_totals = cat_counts.sum(axis=1, keepdims=True)
+    frequency = np.divide(
+        cat_counts,
+        cat_totals,
+        out=np.zeros_like(cat_counts),
+        where=cat_totals > 0,
+    )
+
+    precision = normcdf(precision)
+    frequency = normcdf(frequency)
+    denominator = precision + frequency
+    return np.divide(
+        2 * precision * frequency,
+        denominator,
+        out=np.zeros_like(denominator),
+        where=denominator > 0,
+    )
+
+
+def get_term_associations(
+    texts: pd.Series,
+    categories: pd.Series,
+    min_term_frequency: int = MIN_TERM_FREQUENCY,
+) -> pd.DataFrame:
+    """Score every term's association with every category, one vs. the rest
+
+    All categories are scored at once from one term-document matrix. The
+    scaled F-score is the difference between a term's scaled F-score for the
+    category and for the rest of the corpus (-1 to 1, like scattertext's
+    score difference); PMI is log2 of the term's probability in the category
+    over its probability in the whole corpus.
+
+    Args:
+        texts (pd.Series): Texts with tokens separated by whitespace
+        categories (pd.Series): Category of each text
+        min_term_frequency (int): Minimum count of a term in the whole corpus.
+            Defaults to MIN_TERM_FREQUENCY.
+
+    Returns:
+        pd.DataFrame: Category, Term, Frequency (in the category), Other
+            Frequency (in the rest of the corpus), Scaled F-score and PMI,
+            sorted by category and descending scaled F-score
+    """
+
+    matrix, terms = build_term_matrix(texts)
+    keep = np.asarray(matrix.sum(axis=0)).ravel() >= min_term_frequency
+    matrix, terms = matrix[:, keep], terms[keep]
+
+    codes, category_names = pd.factorize(categories.to_numpy(), sort=True)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))),
+        shape=(len(category_names), len(codes)),
+    )
+    cat_counts = np.asarray((indicator @ matrix).todense(), dtype="float64")
+    term_totals = cat_counts.sum(axis=0, keepdims=True)
+    not_cat_counts = term_totals - cat_counts
+
+    scaled_f_scores = get_scaled_f_scores(
+        cat_counts, not_cat_counts
+    ) - get_scaled_f_scores(not_cat_counts, cat_counts)
+
+    cat_totals = cat_counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pmi = np.log2(
+            (cat_counts / cat_totals) / (term_totals / term_totals.sum())
+        )
+    pmi[cat_counts == 0] = np.nan
+
+    n_categories, n_terms = cat_counts.shape
+    associations = pd.DataFrame(
+        {
+            "Category": np.repeat(np.asarray(category_names), n_terms),
+            "Term": np.tile(terms, n_categories),
+            "Frequency": cat_counts.ravel().astype("int64"),
+            "Other Frequency": not_cat_counts.ravel().astype("int64"),
+            "Scaled F-score": scaled_f_scores.ravel(),
+            "PMI": pmi.ravel(),
+        }
+    )
+
+    return associations.sort_values(
+        ["Category", "Scaled F-score"],
+        ascending=[True, False],
+        ignore_index=True,
+    )
+
+
+def save_term_associations(
+    associations: pd.DataFrame, name: str, top_terms: int = TOP_TERMS
+) -> Tuple[Path, Path]:
+    """Save term associations as a Parquet table and a JSON of the top terms
+
+    Args:
+        associations (pd.DataFrame): Output of get_term_associations
+        name (str): Name for the output files (e.g., "journal")
+        top_terms (int): Number of terms per category in the JSON file.
+            Defaults to TOP_TERMS.
+
+    Returns:
+        Path: Parquet file with every term's scores for every category
+        Path: JSON file with each category's most associated terms
+    """
+
+    parquet_file = gen.OUTPUT_DIRECTORY / f"{name}_term_associations.parquet"
+    json_file = gen.OUTPUT_DIRECTORY / f"{name}_term_associations.json"
+
+    associations.to_parquet(parquet_file, index=False)
+
+    top = associations.groupby("Category", sort=True).head(top_terms)
+    top = top.astype(object).where(top.notna(), None)
+    top_terms_json = {
+        str(category): group.drop(columns="Category").to_dict(orient="records")
+        for category, group in top.groupby("Category", sort=True)
+    }
+    with open(json_file, "w", encoding="utf8") as outfile:
+        json.dump(top_terms_json, outfile, indent=4)
+
+    return parquet_file, json_file
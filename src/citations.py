@@ -0,0 +1,123 @@
+"""Citation quantile labels within publication cohorts"""
+
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Articles are compared with others published the same year
+COHORT_COLUMNS = ["Pub Date"]
+
+
+def get_cohort_quantiles(
+    data: pd.DataFrame,
+    quantiles: Sequence[float],
+    cohort_cols: List[str] = COHORT_COLUMNS,
+    value_col: str = "Citations",
+) -> pd.DataFrame:
+    """Get each article's cohort citation quantiles
+
+    Args:
+        data (pd.DataFrame): Article data
+        quantiles (Sequence[float]): Quantiles (0 to 1)
+        cohort_cols (List[str]): Columns defining a cohort (e.g., ["Journal",
+            "Pub Date"]). Defaults to COHORT_COLUMNS.
+        value_col (str): Column to get quantiles of. Defaults to "Citations".
+
+    Returns:
+        pd.DataFrame: Each row's cohort quantile (one column per quantile),
+            aligned with data
+    """
+
+    grouped = data.groupby(cohort_cols, sort=False)[value_col]
+    return pd.DataFrame(
+        {q: grouped.transform("quantile", q) for q in quantiles}, index=data.index
+    )
+
+
+def label_top(
+    data: pd.DataFrame,
+    quantile: float,
+    label: str,
+    other: str = "not",
+    cohort_cols: List[str] = COHORT_COLUMNS,
+    value_col: str = "Citations",
+) -> pd.Series:
+    """Label articles at or above their cohort's quantile (e.g., most cited)
+
+    Args:
+        data (pd.DataFrame): Article data
+        quantile (float): Quantile (0 to 1)
+        label (str): Label for articles at or above the quantile
+        other (str): Label for the rest. Defaults to "not".
+        cohort_cols (List[str]): Columns defining a cohort. Defaults to
+            COHORT_COLUMNS.
+        value_col (str): Column to compare. Defaults to "Citations".
+
+    Returns:
+        pd.Series: Label for each article
+    """
+
+    threshold = get_cohort_quantiles(data, [quantile], cohort_cols, value_col)
+    above = data[value_col] >= threshold[quantile]
+    return pd.Series(np.where(above, label, other), index=data.index)
+
+
+def label_bottom(
+    data: pd.DataFrame,
+    quantile: float,
+    label: str,
+    other: str = "not",
+    cohort_cols: List[str] = COHORT_COLUMNS,
+    value_col: str = "Citations",
+) -> pd.Series:
+    """Label articles at or below their cohort's quantile (e.g., least cited)
+
+    Args:
+        data (pd.DataFrame): Article data
+        quantile (float): Quantile (0 to 1)
+        label (str): Label for articles at or below the quantile
+        other (str): Label for the rest. Defaults to "not".
+        cohort_cols (List[str]): Columns defining a cohort. Defaults to
+            COHORT_COLUMNS.
+        value_col (str): Column to compare. Defaults to "Citations".
+
+    Returns:
+        pd.Series: Label for each article
+    """
+
+    threshold = get_cohort_quantiles(data, [quantile], cohort_cols, value_col)
+    below = data[value_col] <= threshold[quantile]
+    return pd.Series(np.where(below, label, other), index=data.index)
+
+
+def label_quantile_bands(
+    data: pd.DataFrame,
+    cut_points: Sequence[float],
+    labels: Sequence[str],
+    cohort_cols: List[str] = COHORT_COLUMNS,
+    value_col: str = "Citations",
+) -> pd.Series:
+    """Label articles by the band of cohort quantiles they fall in
+
+    For example, cut_points=[0.1, 0.2, ..., 0.9] with ten labels gives each
+    article its cohort decile. An article on a cut point is in the lower band.
+
+    Args:
+        data (pd.DataFrame): Article data
+        cut_points (Sequence[float]): Increasing quantiles between the bands
+        labels (Sequence[str]): Band labels, one more than the cut points
+        cohort_cols (List[str]): Columns defining a cohort. Defaults to
+            COHORT_COLUMNS.
+        value_col (str): Column to compare. Defaults to "Citations".
+
+    Returns:
+        pd.Series: Band label for each article
+    """
+
+    assert len(labels) == len(cut_points) + 1, "Need one more label than cut points"
+
+    thresholds = get_cohort_quantiles(data, cut_points, cohort_cols, value_col)
+    values = data[value_col].to_numpy()[:, np.newaxis]
+    bands = (values > thresholds.to_numpy()).sum(axis=1)
+    return pd.Series(np.asarray(labels, dtype=object)[bands], index=data.index)
@@ -0,0 +1,151 @@
+"""Settings from settings.json, loaded once and validated"""
+
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+SETTINGS_FILE = Path(__file__).parents[1] / "settings.json"
+# Used if settings.json has no "Excluded Title Terms" (e.g., older settings)
+DEFAULT_EXCLUDED_TITLE_TERMS = (
+    "withdrawn",
+    "retracted",
+    "errata",
+    "correction",
+    "retraction",
+    "editorial",
+    "issue information",
+    "journal information",
+)
+
+
+@dataclass(frozen=True)
+class Scholar:
+    """Scholar in the author corpus sampling frame"""
+
+    first_name: str
+    last_name: str
+    start_year: int
+
+
+@dataclass(frozen=True)
+class Config:
+    """Validated contents of settings.json (see docs/configuration.md)"""
+
+    user_agent: str
+    custom_stopwords: Tuple[str, ...]
+    ollama_model: str
+    scholars: Tuple[Scholar, ...]
+    issns: Dict[str, Tuple[str, ...]]
+    sample_journals: Tuple[str, ...]
+    sample_start_year: int
+    excluded_title_terms: Tuple[str, ...]
+    noncontent_regexes: Tuple[str, ...]
+    test_abstracts: Tuple[Tuple[str, str], ...]
+    test_query: str
+    raw: dict
+
+
+CONFIG_LOCK = threading.Lock()
+CONFIG: Optional[Config] = None
+CONFIG_MTIME: Optional[int] = None
+
+
+def parse_config(settings: dict) -> Config:
+    """Validate settings.json contents and convert them to a Config
+
+    Args:
+        settings (dict): Parsed settings.json
+
+    Returns:
+        Config: Validated settings
+    """
+
+    for key in [
+        "CrossRef",
+        "Custom Stopwords",
+        "Ollama Model",
+        "Scholars",
+        "ISSNs",
+        "Journal Pub Sample",
+        "Non-content Regexes",
+        "Test Abstracts",
+        "Test Query",
+    ]:
+        assert key in settings, f"{key} not in settings.json"
+
+    assert "User-Agent" in settings["CrossRef"], "User-Agent not in settings.json"
+
+    for scholar in settings["Scholars"]:
+        for key in ["first_name", "last_name", "start_year"]:
+            assert key in scholar, f"{key} missing for a scholar in settings.json"
+        assert isinstance(scholar["start_year"], int), "start_year must be an integer"
+
+    for journal, issns in settings["ISSNs"].items():
+        assert isinstance(issns, list), f"ISSNs for {journal} must be a list"
+
+    sample = settings["Journal Pub Sample"]
+    assert "journals" in sample, "journals not in Journal Pub Sample"
+    assert "start_year" in sample, "start_year not in Journal Pub Sample"
+    assert isinstance(sample["journals"], list), "journals must be a list"
+    assert isinstance(sample["start_year"], int), "start_year must be an integer"
+    for journal in sample["journals"]:
+        assert journal in settings["ISSNs"], f"{journal} not in ISSNs in settings.json"
+
+    excluded_title_terms = settings.get(
+        "Excluded Title Terms", list(DEFAULT_EXCLUDED_TITLE_TERMS)
+    )
+    assert isinstance(excluded_title_terms, list), "Excluded Title Terms must be a list"
+
+    for test_abstract in settings["Test Abstracts"]:
+        assert len(test_abstract) == 2, "Test Abstracts must be [field, abstract]"
+
+    return Config(
+        user_agent=settings["CrossRef"]["User-Agent"],
+        custom_stopwords=tuple(settings["Custom Stopwords"]),
+        ollama_model=settings["Ollama Model"],
+        scholars=tuple(
+            Scholar(s["first_name"], s["last_name"], s["start_year"])
+            for s in settings["Scholars"]
+        ),
+        issns={
+            journal: tuple(issns) for journal, issns in settings["ISSNs"].items()
+        },
+        sample_journals=tuple(sample["journals"]),
+        sample_start_year=sample["start_year"],
+        excluded_title_terms=tuple(excluded_title_terms),
+        noncontent_regexes=tuple(settings["Non-content Regexes"]),
+        test_abstracts=tuple(
+            (field, abstract) for field, abstract in settings["Test Abstracts"]
+        ),
+        test_query=settings["Test Query"],
+        raw=settings,
+    )
+
+
+def get_config() -> Config:
+    """Get the settings from settings.json
+
+    The file is only read (and validated) again if it has been modified
+    since it was last loaded.
+
+    Returns:
+        Config: Validated settings
+    """
+    global CONFIG, CONFIG_MTIME
+
+    assert SETTINGS_FILE.exists(), f"Settings file not found at {SETTINGS_FILE}"
+    mtime = SETTINGS_FILE.stat().st_mtime_ns
+
+    with CONFIG_LOCK:
+        if CONFIG is None or mtime != CONFIG_MTIME:
+            with open(SETTINGS_FILE, encoding="utf8") as infile:
+                json_data = infile.read()
+
+            assert json_data, "No data in settings.json"
+
+            CONFIG = parse_config(json.loads(json_data))
+            CONFIG_MTIME = mtime
+
+    return CONFIG
@@ -1,15 +1,84 @@
 """CrossRef API Functions"""
 
+import hashlib
+import html
 import json
+import os
+import re
+import shutil
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
 
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
-
-SETTINGS_FILE = Path(__file__).parents[1] / "settings.json"
-assert SETTINGS_FILE.exists(), f"Settings file not found at {SETTINGS_FILE}"
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import src.config as cfg
+
+# CrossRef "polite pool" limits (requests that identify themselves with a mailto)
+# https://api.crossref.org/swagger-ui/index.html
+MAX_WORKERS = 3
+REQUESTS_PER_SECOND = 10
+ROWS_PER_PAGE = 1000
+
+# Crossref keeps an unused deep-paging cursor alive for five minutes
+CURSOR_LIFETIME = 5 * 60
+CHECKPOINT_DIRECTORY = Path(__file__).parents[1] / "data" / "crossref_checkpoints"
+CACHE_DIRECTORY = Path(__file__).parents[1] / "data" / "crossref_cache"
+
+# JATS abstract markup, see remove_xml_from_abstracts
+JATS_TITLE_REGEX = re.compile(r"<jats:title\b[^>]*>.*?</jats:title\s*>", re.I | re.S)
+JATS_PARAGRAPH_REGEX = re.compile(r"<jats:p\b[^>]*>(.*?)</jats:p\s*>", re.I | re.S)
+JATS_PARAGRAPH_OPEN_REGEX = re.compile(r"<jats:p\b", re.I)
+XML_TAG_REGEX = re.compile(r"<!--.*?-->|</?[A-Za-z][^>]*>", re.S)
+
+# Retry throttled (429) and server error responses with exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+
+
+class RateLimiter:
+    """Thread-safe token bucket used to keep requests within the API rate limit"""
+
+    def __init__(self, rate: float, capacity: Optional[int] = None) -> None:
+        """
+        Args:
+            rate (float): Tokens (requests) added to the bucket per second
+            capacity (Optional[int]): Maximum burst size. Defaults to rate.
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it"""
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+REQUEST_SLOTS = threading.BoundedSemaphore(MAX_WORKERS)
+SESSION_LOCK = threading.Lock()
+SESSION: Optional[requests.Session] = None
 
 
 def get_user_agent() -> str:
@@ -21,19 +90,12 @@ def get_user_agent() -> str:
     Returns:
         str: User-Agent for Crossref API
     """
-    with open(SETTINGS_FILE, encoding="utf8") as infile:
-        json_data = infile.read()
-
-    assert json_data, "No data in settings.json"
-
-    settings = json.loads(json_data)
-    assert "CrossRef" in settings, "CrossRef not in settings.json"
-    assert "User-Agent" in settings["CrossRef"], "User-Agent not in settings.json"
+    user_agent = cfg.get_config().user_agent
     assert (
-        "YourEmailHere" not in settings["CrossRef"]["User-Agent"]
+        "YourEmailHere" not in user_agent
     ), "Please update your email in settings.json -> CrossRef -> User-Agent"
 
-    return settings["CrossRef"]["User-Agent"]
+    return user_agent
 
 
 def get_issn_list(journals: Optional[List[str]] = None) -> List[str]:
@@ -45,169 +107,512 @@ def get_issn_list(journals: Optional[List[str]] = None) -> List[str]:
     Returns:
         [str]: List of ISSNs
     """
-    with open(SETTINGS_FILE, encoding="utf8") as infile:
-        json_data = infile.read()
-
-    assert json_data, "No data in settings.json"
-
-    settings = json.loads(json_data)
-    assert "ISSNs" in settings, "ISSNs not in settings.json"
+    issns = cfg.get_config().issns
 
     if journals:
         # Return ISSNs for specified journals
         return [
-            issn
-            for journal in settings["ISSNs"]
-            for issn in settings["ISSNs"][journal]
-            if journal in journals
+            issn for journal in issns for issn in issns[journal] if journal in journals
         ]
 
     # Return all ISSNs if no journals specified
-    return [
-        issn for journal in settings["ISSNs"] for issn in settings["ISSNs"][journal]
-    ]
+    return [issn for journal in issns for issn in issns[journal]]
+
+
+def get_session() -> requests.Session:
+    """Get the session shared by all Crossref requests
+
+    The session is created on first use. It pools connections, sends the
+    User-Agent with every request, and retries throttled and server error
+    responses with exponential backoff (honoring any Retry-After header).
+
+    Returns:
+        requests.Session: Shared Crossref session
+    """
+    global SESSION
+
+    with SESSION_LOCK:
+        if SESSION is None:
+            retries = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=1,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET"],
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=MAX_WORKERS,
+                pool_maxsize=MAX_WORKERS,
+                max_retries=retries,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = get_user_agent()
+            SESSION = session
+
+    return SESSION
+
+
+def get_cache_file(url: str) -> Path:
+    """Get the response cache file for a URL
+
+    Args:
+        url (str): Crossref API URL
+
+    Returns:
+        Path: Cache file for the URL
+    """
+    CACHE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    return CACHE_DIRECTORY / f"{hashlib.sha256(url.encode('utf8')).hexdigest()}.json"
 
 
-def get_works_by_name(fname: str, lname: str, s_year: int) -> dict:
-    """Get works by author name
+def request_crossref(url: str, timeout: int, use_cache: bool = True) -> dict:
+    """Send a rate-limited GET request to the Crossref API
+
+    At most MAX_WORKERS requests are in flight at once, no matter how many
+    threads are collecting data. If a response for the URL was cached with an
+    ETag or Last-Modified header, the request is made conditional and the
+    cached response is used when Crossref replies 304 Not Modified.
+
+    Cursor-paged requests shouldn't use the cache: a 304 would replay the
+    stored next-cursor, which expires a few minutes after it was issued.
+
+    Args:
+        url (str): Crossref API URL
+        timeout (int): Request timeout in seconds
+        use_cache (bool): Use the on-disk response cache. Defaults to True.
+
+    Returns:
+        dict: "message" portion of the Crossref response
+    """
+    cached = None
+    headers = {}
+    if use_cache:
+        cache_file = get_cache_file(url)
+        if cache_file.exists():
+            with open(cache_file, encoding="utf8") as infile:
+                cached = json.load(infile)
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+    with REQUEST_SLOTS:
+        RATE_LIMITER.acquire()
+        response = get_session().get(url, headers=headers, timeout=timeout)
+
+    if cached and response.status_code == requests.codes.not_modified:
+        return cached["message"]
+    response.raise_for_status()
+
+    data = response.json()
+    assert data["status"] == "ok", f"Crossref API query failed for {url}"
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if use_cache and (etag or last_modified):
+        # Written to a temporary file first so readers never see a partial file
+        temp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(temp_file, "w", encoding="utf8") as outfile:
+            json.dump(
+                {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "message": data["message"],
+                },
+                outfile,
+            )
+        os.replace(temp_file, cache_file)
+
+    return data["message"]
+
+
+@lru_cache(maxsize=None)
+def get_issn_filter(issns: Tuple[str, ...]) -> str:
+    """Build (once) the Crossref filter restricting works to a set of ISSNs
+
+    Args:
+        issns (Tuple[str, ...]): ISSNs to filter on
+
+    Returns:
+        str: Comma-separated issn filters
+    """
+    return ",".join(f"issn:{issn}" for issn in issns)
+
+
+def iter_cursor_pages(url: str, timeout: int) -> Iterator[List[dict]]:
+    """Get every page of a Crossref works query using cursor-based deep paging
+
+    The first page is requested without a cursor, so it can be served from
+    the response cache. Cursor paging is only used if there are more results
+    than fit on that page.
+
+    Args:
+        url (str): Crossref API works URL (with query and filters)
+        timeout (int): Request timeout in seconds
+
+    Yields:
+        List[dict]: Page of works
+    """
+    message = request_crossref(f"{url}&rows={ROWS_PER_PAGE}", timeout=timeout)
+    if message["total-results"] <= len(message["items"]):
+        if message["items"]:
+            yield message["items"]
+        return
+
+    cursor = "*"
+    while True:
+        page_url = f"{url}&rows={ROWS_PER_PAGE}&cursor={quote(cursor, safe='*')}"
+        message = request_crossref(page_url, timeout=timeout, use_cache=False)
+        if not message["items"]:
+            return
+        yield message["items"]
+        cursor = message["next-cursor"]
+
+
+def iter_works_by_name(
+    fname: str,
+    lname: str,
+    s_year: int,
+    issns: Tuple[str, ...],
+    from_index_date: Optional[str] = None,
+) -> Iterator[List[dict]]:
+    """Get works by author name a page at a time
 
     Args:
         fname (str): First name
         lname (str): Last name
         s_year (int): Start year
+        issns (Tuple[str, ...]): Only get works published in these ISSNs
+        from_index_date (Optional[str]): Only get works indexed (added or
+            updated) on or after this date (YYYY-MM-DD). Defaults to None.
 
-    Returns:
-        dict: Works
+    Yields:
+        List[dict]: Page of works
     """
+    assert issns, "At least one ISSN is needed to search for works by name"
+
     url = "https://api.crossref.org/works?"
     url += f"query.author={fname}+{lname}"
     url += f"&filter=from-pub-date:{s_year}-01-01"
-    for issn in get_issn_list():
-        url += f",issn:{issn}"
-    url += "&rows=1000"
-    headers = {"User-Agent": get_user_agent()}
-    response = requests.get(url, headers=headers, timeout=30)
-    response.raise_for_status()
+    if from_index_date:
+        url += f",from-index-date:{from_index_date}"
+    url += f",{get_issn_filter(issns)}"
 
-    assert (
-        response.json()["status"] == "ok"
-    ), f"Crossref API query failed for {fname} {lname}"
+    yield from iter_cursor_pages(url, timeout=30)
+
+
+def get_checkpoint_files(issn: str) -> Tuple[Path, Path]:
+    """Get the checkpoint files for an ISSN
+
+    Args:
+        issn (str): Journal ISSN
 
-    return response.json()["message"]["items"]
+    Returns:
+        Path: JSON file with the paging state (cursor, items fetched, etc.)
+        Path: JSON lines file with the works fetched so far
+    """
+    CHECKPOINT_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    return (
+        CHECKPOINT_DIRECTORY / f"{issn}.json",
+        CHECKPOINT_DIRECTORY / f"{issn}.jsonl",
+    )
 
 
-def get_works_by_issn(issn: str, s_year: int) -> dict:
-    """Get works by ISSN
+def load_checkpoint(issn: str, query: str) -> dict:
+    """Load the paging state for an ISSN, or start a new one
+
+    A checkpoint is only reused if it was made for the same query. Works
+    written after the last saved state (i.e., mid-crash) are discarded. The
+    state's "active_query" is the query its cursor belongs to, which differs
+    from "query" once an expired cursor has been restarted.
 
     Args:
         issn (str): Journal ISSN
-        s_year (int): Start year
+        query (str): Query string the checkpoint was made for
 
     Returns:
-        dict: Works
+        dict: Paging state
     """
-    all_results = []
-    total_results = 0
-    current_offset = 0
+    state_file, items_file = get_checkpoint_files(issn)
+
+    if state_file.exists() and items_file.exists():
+        with open(state_file, encoding="utf8") as infile:
+            state = json.load(infile)
+        if state["query"] == query:
+            os.truncate(items_file, state["bytes"])
+            state.setdefault("active_query", query)
+            return state
+
+    items_file.write_text("", encoding="utf8")
+    return {
+        "query": query,
+        "active_query": query,
+        "cursor": "*",
+        "n_items": 0,
+        "bytes": 0,
+        "last_indexed": None,
+        "updated": 0.0,
+        "complete": False,
+    }
+
+
+def save_checkpoint(issn: str, state: dict) -> None:
+    """Save the paging state for an ISSN
 
-    while total_results == 0 or current_offset < total_results:
+    Args:
+        issn (str): Journal ISSN
+        state (dict): Paging state
+    """
+    state_file, _ = get_checkpoint_files(issn)
+    temp_file = state_file.with_suffix(".tmp")
+    with open(temp_file, "w", encoding="utf8") as outfile:
+        json.dump(state, outfile)
+    temp_file.replace(state_file)
 
-        url = f"https://api.crossref.org/journals/{issn}/works?"
-        url += f"filter=from-pub-date:{s_year}-01-01"
-        url += "&rows=1000"
-        if current_offset:
-            url += f"&offset={current_offset}"
-        headers = {"User-Agent": get_user_agent()}
-        response = requests.get(url, headers=headers, timeout=100)
-        response.raise_for_status()
 
-        assert (
-            response.json()["status"] == "ok"
-        ), f"Crossref API query failed for issn: {issn}"
+def clear_checkpoints() -> None:
+    """Delete all checkpoints once their data have been saved"""
 
-        all_results.extend(response.json()["message"]["items"])
-        total_results = response.json()["message"]["total-results"]
-        current_offset += response.json()["message"]["items-per-page"]
+    if CHECKPOINT_DIRECTORY.exists() and CHECKPOINT_DIRECTORY.is_dir():
+        shutil.rmtree(CHECKPOINT_DIRECTORY)
 
-    return all_results
 
+def read_checkpoint_pages(items_file: Path) -> Iterator[List[dict]]:
+    """Read the works saved in a checkpoint back a page at a time
 
-def parse_author_works_to_df(fname: str, lname: str, works: List[dict]) -> pd.DataFrame:
-    """Parse works to DataFrame
+    Args:
+        items_file (Path): JSON lines file with the works fetched so far
+
+    Yields:
+        List[dict]: Page of works
+    """
+    page = []
+    with open(items_file, encoding="utf8") as infile:
+        for line in infile:
+            page.append(json.loads(line))
+            if len(page) == ROWS_PER_PAGE:
+                yield page
+                page = []
+    if page:
+        yield page
+
+
+def iter_works_by_issn(
+    issn: str, s_year: int, from_index_date: Optional[str] = None
+) -> Iterator[List[dict]]:
+    """Get works by ISSN a page at a time using cursor-based deep paging
+
+    Each page is appended to a checkpoint file as it arrives, so an
+    interrupted pull picks up where it stopped. Works already in the
+    checkpoint are yielded first. If the saved cursor has since expired, the
+    pull restarts from the index date of the last work fetched (results are
+    sorted by index date) and skips works it already has.
 
     Args:
-        works (dict): Works responses from Crossref API
+        issn (str): Journal ISSN
+        s_year (int): Start year
+        from_index_date (Optional[str]): Only get works indexed (added or
+            updated) on or after this date (YYYY-MM-DD). Defaults to None.
+
+    Yields:
+        List[dict]: Page of works
     """
-    rows = []
+    query = f"filter=from-pub-date:{s_year}-01-01"
+    if from_index_date:
+        query += f",from-index-date:{from_index_date}"
+    state = load_checkpoint(issn, query)
+    _, items_file = get_checkpoint_files(issn)
+
+    seen_dois = set()
+    for page in read_checkpoint_pages(items_file):
+        seen_dois.update(work["DOI"] for work in page)
+        yield page
+
+    if state["complete"]:
+        return
+
+    if state["n_items"] and time.time() - state["updated"] > CURSOR_LIFETIME:
+        restart_query = f"filter=from-pub-date:{s_year}-01-01"
+        restart_query += f",from-index-date:{state['last_indexed'][:10]}"
+        state["active_query"] = restart_query
+        state["cursor"] = "*"
+        save_checkpoint(issn, state)
+
+    while True:
+        url = f"https://api.crossref.org/journals/{issn}/works?"
+        url += state["active_query"]
+        url += f"&rows={ROWS_PER_PAGE}"
+        url += "&sort=indexed&order=asc"
+        url += f"&cursor={quote(state['cursor'], safe='*')}"
+        message = request_crossref(url, timeout=100, use_cache=False)
+
+        if not message["items"]:
+            state["complete"] = True
+            save_checkpoint(issn, state)
+            return
+
+        page = [work for work in message["items"] if work["DOI"] not in seen_dois]
+        with open(items_file, "a", encoding="utf8") as outfile:
+            for work in page:
+                outfile.write(json.dumps(work) + "\n")
+            state["bytes"] = outfile.tell()
+
+        state["n_items"] += len(page)
+        state["cursor"] = message["next-cursor"]
+        state["last_indexed"] = message["items"][-1]["indexed"]["date-time"]
+        state["updated"] = time.time()
+        save_checkpoint(issn, state)
+
+        yield page
+
+
+WORK_COLUMNS = [
+    "DOI",
+    "Title",
+    "Journal",
+    "Authors",
+    "Abstract",
+    "Pub Date",
+    "Citations",
+]
+WORK_DTYPES = {"Pub Date": "int64", "Citations": "int64"}
+
+
+def is_author_of(authors: List[dict], fname: str, lname: str) -> bool:
+    """Check whether a scholar is one of a work's authors
+
+    Args:
+        authors (List[dict]): Work's authors (with "given" and "family" names)
+        fname (str): First name
+        lname (str): Last name
+
+    Returns:
+        bool: True if the scholar is listed as an author
+    """
+    for author in authors:
+        if (
+            fname.lower() in author.get("given", "").lower()
+            and lname.lower() in author.get("family", "").lower()
+        ):
+            return True
+    return False
+
+
+def parse_works_page(
+    works: List[dict], fname: Optional[str] = None, lname: Optional[str] = None
+) -> pd.DataFrame:
+    """Parse one page of works into a columnar batch
+
+    Args:
+        works (List[dict]): Page of work responses from Crossref API
+        fname (Optional[str]): If given with lname, only keep works by this
+            scholar. Defaults to None.
+        lname (Optional[str]): Scholar's last name. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Batch of parsed works
+    """
+    columns = {column: [] for column in WORK_COLUMNS}
     for work in works:
         # If article doesn't have a title or isn't an article, skip it
-        if not work.get("title") or work['type'] != 'journal-article':
+        if not work.get("title") or work["type"] != "journal-article":
             continue
-
-        for author in work["author"]:
-            if (
-                fname.lower() in author.get("given","").lower()
-                and lname.lower() in author.get("family", "").lower()
-            ):
-                break
-        else:
+        authors = [
+            {"given": author.get("given", ""), "family": author.get("family", "")}
+            for author in work.get("author", [])
+        ]
+        if fname and lname and not is_author_of(authors, fname, lname):
             continue
-        doi = work["DOI"]
-        title = work["title"][0]
-        journal = work["container-title"][0]
-        abstract = work.get("abstract")
-        pub_date = work["published"]["date-parts"][0][0]
-        citations = work["is-referenced-by-count"]
-        rows.append((fname, lname, doi, title, journal, abstract, pub_date, citations))
-    df = pd.DataFrame(
-        rows,
-        columns=[
-            "First_name",
-            "Last_name",
-            "DOI",
-            "Title",
-            "Journal",
-            "Abstract",
-            "Pub Date",
-            "Citations",
-        ],
-    ).drop_duplicates("DOI")
 
-    return df
+        columns["DOI"].append(work["DOI"])
+        columns["Title"].append(work["title"][0])
+        columns["Journal"].append(work["container-title"][0])
+        columns["Authors"].append(authors)
+        columns["Abstract"].append(work.get("abstract"))
+        columns["Pub Date"].append(work["published"]["date-parts"][0][0])
+        columns["Citations"].append(work["is-referenced-by-count"])
 
-def parse_journal_works_to_df(works: List[dict]) -> pd.DataFrame:
+    return pd.DataFrame(columns).astype(WORK_DTYPES)
+
+
+def parse_author_works_to_df(
+    fname: str, lname: str, pages: Iterable[List[dict]]
+) -> pd.DataFrame:
     """Parse works to DataFrame
 
+    Each page is parsed into a columnar batch as it arrives, so only one page
+    of raw works is held in memory at a time.
+
     Args:
-        works (dict): Works responses from Crossref API
+        fname (str): First name
+        lname (str): Last name
+        pages (Iterable[List[dict]]): Pages of work responses from Crossref API
     """
-    rows = []
-    for work in works:
-        # If article doesn't have a title or isn't an article, skip it
-        if not work.get("title") or work['type'] != 'journal-article':
-            continue
+    batches = [parse_works_page(page, fname, lname) for page in pages]
+    batches = batches or [parse_works_page([])]
+    df = pd.concat(batches, ignore_index=True).drop_duplicates("DOI")
+    df.insert(0, "First_name", fname)
+    df.insert(1, "Last_name", lname)
+
+    return df
+
+
+def match_author_works_in_df(
+    scholars: List[cfg.Scholar], journal_data: pd.DataFrame
+) -> List[pd.DataFrame]:
+    """Find scholars' works in already collected journal data
+
+    The journal data's author lists are flattened and lower-cased once and
+    then every scholar is matched against them, using the same name matching
+    as the Crossref API results.
+
+    Args:
+        scholars (List[cfg.Scholar]): Scholars from settings.json
+        journal_data (pd.DataFrame): Collected journal data (with Authors)
 
-        doi = work["DOI"]
-        title = work["title"][0]
-        journal = work["container-title"][0]
-        abstract = work.get("abstract", None)
-        pub_date = work["published"]["date-parts"][0][0]
-        citations = work["is-referenced-by-count"]
-        rows.append((doi, title, journal, abstract, pub_date, citations))
-    df = pd.DataFrame(
-        rows,
-        columns=[
-            "DOI",
-            "Title",
-            "Journal",
-            "Abstract",
-            "Pub Date",
-            "Citations",
-        ],
-    ).drop_duplicates("DOI")
+    Returns:
+        List[pd.DataFrame]: Each scholar's works, in the same order as scholars
+    """
+    journal_data = journal_data.reset_index(drop=True)
+    authors = journal_data[["Pub Date", "Authors"]].explode("Authors").dropna()
+    given = authors["Authors"].str.get("given").fillna("").str.lower()
+    family = authors["Authors"].str.get("family").fillna("").str.lower()
+
+    matches = []
+    for scholar in scholars:
+        fname, lname = scholar.first_name, scholar.last_name
+        is_match = (
+            given.str.contains(fname.lower(), regex=False)
+            & family.str.contains(lname.lower(), regex=False)
+            & (authors["Pub Date"] >= scholar.start_year)
+        )
+        rows = authors.index[is_match].unique()
+        df = journal_data.loc[rows, WORK_COLUMNS].drop_duplicates("DOI")
+        df.insert(0, "First_name", fname)
+        df.insert(1, "Last_name", lname)
+        matches.append(df.reset_index(drop=True))
+
+    return matches
+
+
+def parse_journal_works_to_df(pages: Iterable[List[dict]]) -> pd.DataFrame:
+    """Parse works to DataFrame
+
+    Each page is parsed into a columnar batch as it arrives, so only one page
+    of raw works is held in memory at a time.
+
+    Args:
+        pages (Iterable[List[dict]]): Pages of work responses from Crossref API
+    """
+    batches = [parse_works_page(page) for page in pages]
+    batches = batches or [parse_works_page([])]
+    df = pd.concat(batches, ignore_index=True).drop_duplicates("DOI")
 
     return df
 
+
 def remove_xml_from_abstract(abstract_text:str) -> str | None:
     """Cleans the abstract text of XML tags
     Args:
@@ -232,3 +637,57 @@ def remove_xml_from_abstract(abstract_text:str) -> str | None:
             cleaned_text += element.get_text()
 
     return cleaned_text.strip()
+
+
+def clean_jats_abstract(abstract_text: Optional[str]) -> Optional[str]:
+    """Cleans the abstract text of XML tags without building a parse tree
+
+    Regular expression fast path for remove_xml_from_abstract: titles are
+    dropped, the text of each jats:p paragraph is kept (joined by spaces), and
+    remaining tags and entities are stripped/decoded. Abstracts the regexes
+    can't split into paragraphs the way a parser would (a jats:p nested
+    inside another, e.g. in a jats:list, or an unclosed jats:p) or that have
+    CDATA sections are cleaned with remove_xml_from_abstract.
+
+    Args:
+        abstract_text (Optional[str]): Abstract text with XML tags
+
+    Returns:
+        str: cleaned abstract or None if no abstract text
+    """
+
+    if not isinstance(abstract_text, str) or not abstract_text:
+        return None
+
+    abstract_text = JATS_TITLE_REGEX.sub("", abstract_text)
+    paragraphs = JATS_PARAGRAPH_REGEX.findall(abstract_text)
+    if (
+        len(JATS_PARAGRAPH_OPEN_REGEX.findall(abstract_text)) != len(paragraphs)
+        or "<![CDATA[" in abstract_text
+    ):
+        return remove_xml_from_abstract(abstract_text)
+
+    cleaned_text = " ".join(
+        html.unescape(XML_TAG_REGEX.sub("", paragraph)) for paragraph in paragraphs
+    )
+
+    return cleaned_text.strip()
+
+
+def remove_xml_from_abstracts(abstracts: pd.Series) -> pd.Series:
+    """Cleans a column of abstracts of XML tags
+
+    Bulk version of remove_xml_from_abstract that gives the same output
+    without building a BeautifulSoup tree for every abstract.
+
+    Args:
+        abstracts (pd.Series): Abstract texts with XML tags
+
+    Returns:
+        pd.Series: cleaned abstracts (None where there is no abstract text)
+    """
+    return pd.Series(
+        [clean_jats_abstract(abstract) for abstract in abstracts],
+        index=abstracts.index,
+        dtype=object,
+    )
@@ -0,0 +1,144 @@
+"""Persistent embedding cache keyed by model and text content"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import src.general as gen
+
+EMBEDDING_CACHE_DIRECTORY = gen.DATA_DIRECTORY / "embedding_cache"
+HASH_LENGTH = 64
+
+
+class EmbeddingCache:
+    """Embeddings of one model, stored as a memory-mapped float32 array
+
+    Each model has a directory with vectors.f32 (one row of float32 values
+    per text), index.txt (the hash of each row's text, one per line) and
+    meta.json (the model and number of dimensions). New embeddings are
+    appended to both files, so texts are only embedded the first time they
+    are seen.
+    """
+
+    def __init__(self, model: str, directory: Optional[Path] = None):
+        """Open (or create) a model's embedding cache
+
+        Args:
+            model (str): Embedding model
+            directory (Optional[Path]): Cache directory. Defaults to None
+                (EMBEDDING_CACHE_DIRECTORY).
+        """
+
+        model_hash = hashlib.sha256(model.encode("utf8")).hexdigest()[:16]
+        self.model = model
+        self.directory = (directory or EMBEDDING_CACHE_DIRECTORY) / model_hash
+        self.vectors_file = self.directory / "vectors.f32"
+        self.index_file = self.directory / "index.txt"
+        self.meta_file = self.directory / "meta.json"
+        self.lock = threading.Lock()
+        self.rows: Dict[str, int] = {}
+        self.dimensions: Optional[int] = None
+        self.vectors: Optional[np.memmap] = None
+        self.load()
+
+    def load(self) -> None:
+        """Read the index and map the vectors
+
+        Rows without both a vector and an index line (e.g., after an
+        interrupted write) are dropped from the files.
+        """
+
+        if not self.meta_file.exists():
+            return
+
+        with open(self.meta_file, encoding="utf8") as infile:
+            self.dimensions = json.load(infile)["dimensions"]
+
+        hashes = []
+        if self.index_file.exists():
+            with open(self.index_file, encoding="utf8") as infile:
+                hashes = [line.rstrip("\n") for line in infile]
+        while hashes and len(hashes[-1]) != HASH_LENGTH:
+            hashes.pop()
+
+        row_bytes = self.dimensions * np.dtype("float32").itemsize
+        vector_bytes = (
+            self.vectors_file.stat().st_size if self.vectors_file.exists() else 0
+        )
+        n_rows = min(len(hashes), vector_bytes // row_bytes)
+        if n_rows != len(hashes) or n_rows * row_bytes != vector_bytes:
+            with open(self.index_file, "w", encoding="utf8") as outfile:
+                outfile.writelines(f"{h}\n" for h in hashes[:n_rows])
+            with open(self.vectors_file, "ab") as outfile:
+                outfile.truncate(n_rows * row_bytes)
+
+        self.rows = {h: i for i, h in enumerate(hashes[:n_rows])}
+        self.map_vectors()
+
+    def map_vectors(self) -> None:
+        """Memory map the stored vectors"""
+
+        if self.rows:
+            self.vectors = np.memmap(
+                self.vectors_file,
+                dtype="float32",
+                mode="r",
+                shape=(len(self.rows), self.dimensions),
+            )
+
+    def add(self, hashes: List[str], vectors: List[List[float]]) -> None:
+        """Append new embeddings to the cache
+
+        Args:
+            hashes (List[str]): Hashes of the embedded texts (not in the cache)
+            vectors (List[List[float]]): Embeddings
+        """
+
+        if not hashes:
+            return
+
+        array = np.asarray(vectors, dtype="float32")
+        if self.dimensions is None:
+            self.dimensions = array.shape[1]
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.meta_file, "w", encoding="utf8") as outfile:
+                json.dump({"model": self.model, "dimensions": self.dimensions}, outfile)
+        assert array.shape[1] == self.dimensions, "Embedding dimensions changed"
+
+        with open(self.vectors_file, "ab") as outfile:
+            outfile.write(array.tobytes())
+        with open(self.index_file, "a", encoding="utf8") as outfile:
+            outfile.writelines(f"{h}\n" for h in hashes)
+
+        n_rows = len(self.rows)
+        self.rows.update((h, n_rows + i) for i, h in enumerate(hashes))
+        self.map_vectors()
+
+    def embed(
+        self, texts: List[str], embed: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Get embeddings for texts, only embedding texts not in the cache
+
+        Args:
+            texts (List[str]): Texts to embed
+            embed (Callable[[List[str]], List[List[float]]]): Embeds texts
+                missing from the cache
+
+        Returns:
+            List[List[float]]: Embedding for each text
+        """
+
+        if not texts:
+            return []
+
+        with self.lock:
+            hashes = [gen.hash_text(text) for text in texts]
+            new_texts = {h: text for h, text in zip(hashes, texts) if h not in self.rows}
+            if new_texts:
+                self.add(list(new_texts), embed(list(new_texts.values())))
+
+            return self.vectors[[self.rows[h] for h in hashes]].tolist()
@@ -1,9 +1,10 @@
 """Embedding functions"""
 
 import shutil
-from time import sleep
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
+import chromadb
 import httpx
 import numpy as np
 import ollama
@@ -14,13 +15,61 @@ import tqdm
 
 from sklearn.manifold import TSNE
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import DataFrameLoader
-from langchain_ollama import OllamaEmbeddings
+from langchain_core.embeddings import Embeddings
 
+import src.config as cfg
 import src.general as gen
+from src.embedding_cache import EmbeddingCache
+from src.ollama_client import OllamaEmbedClient
 
 VECTORDB_DIRECTORY = gen.DATA_DIRECTORY / "vectordb"
 SCATTERPLOT_FILE = gen.OUTPUT_DIRECTORY / "tsne_scatterplot.html"
+# Documents added to/deleted from the vector database at a time
+ADD_BATCH_SIZE = 1000
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """LangChain embeddings using the batched, concurrent Ollama client
+
+    Embeddings are cached by model and text, so a text is only sent to
+    Ollama the first time it is embedded.
+    """
+
+    def __init__(self, model: str, host: Optional[str] = None):
+        """Create the embeddings
+
+        Args:
+            model (str): Ollama model
+            host (Optional[str]): Ollama server URL. Defaults to None
+                (OLLAMA_HOST or the local default).
+        """
+
+        self.client = OllamaEmbedClient(model, host)
+        self.cache = EmbeddingCache(model)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents"""
+
+        return self.cache.embed(list(texts), self.client.embed)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query"""
+
+        return self.cache.embed([text], self.client.embed)[0]
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(model: str) -> OllamaBatchEmbeddings:
+    """Get the (cached) embeddings for a model, shared by all callers
+
+    Args:
+        model (str): Ollama model
+
+    Returns:
+        OllamaBatchEmbeddings: LangChain embeddings
+    """
+
+    return OllamaBatchEmbeddings(model)
 
 
 def create_vectordb_directory() -> None:
@@ -43,10 +92,7 @@ def get_ollama_model() -> str:
         str: Ollama model from settings.json
     """
 
-    settings = gen.get_settings()
-    assert "Ollama Model" in settings, "Ollama Model not in settings.json"
-
-    return settings["Ollama Model"]
+    return cfg.get_config().ollama_model
 
 
 def get_test_abstracts() -> List[Tuple[str, str]]:
@@ -57,12 +103,7 @@ def get_test_abstracts() -> List[Tuple[str, str]]:
         str: Abstract
     """
 
-    settings = gen.get_settings()
-    assert "Test Abstracts" in settings, "Test Abstracts not in settings.json"
-
-    abstracts = [(field, abstract) for field, abstract in settings["Test Abstracts"]]
-
-    return abstracts
+    return list(cfg.get_config().test_abstracts)
 
 
 def get_test_query() -> str:
@@ -72,10 +113,7 @@ def get_test_query() -> str:
         str: Test query
     """
 
-    settings = gen.get_settings()
-    assert "Test Query" in settings, "Test Query not in settings.json"
-
-    return settings["Test Query"]
+    return cfg.get_config().test_query
 
 
 def ollama_is_ready(model: str) -> bool:
@@ -112,8 +150,7 @@ def get_embedding(model: str, text: str) -> List[float]:
         List[float]: Embedding for the text
     """
 
-    result = ollama.embeddings(model=model, prompt=text)
-    return result["embedding"]
+    return get_embeddings(model).embed_query(text)
 
 
 def get_cosine_similarity(embedding1: list, embedding2: list) -> float:
@@ -130,13 +167,32 @@ def get_cosine_similarity(embedding1: list, embedding2: list) -> float:
     return sklearn.metrics.pairwise.cosine_similarity([embedding1], [embedding2])[0][0]
 
 
-def create_vectordb(journal_data: pd.DataFrame, model: str) -> Chroma:
-    """Create or load the vector database
+def get_vectordb_documents(journal_data: pd.DataFrame) -> pd.DataFrame:
+    """Get the documents the vector database should hold, indexed by DOI
+
+    Args:
+        journal_data (pd.DataFrame): Journal data
+
+    Returns:
+        pd.DataFrame: Abstract_clean and the metadata columns, one row per DOI
+    """
+
+    return (
+        journal_data.dropna(subset=["DOI", "Abstract_clean"])
+        .drop_duplicates(subset="DOI", keep="last")
+        .set_index("DOI", drop=False)
+    )
+
+
+def sync_vectordb(journal_data: pd.DataFrame, model: str) -> Chroma:
+    """Bring the vector database up to date with the journal data
 
-    This is FAR from the best way to load the data. However, for computers with
-    limited GPU memory (and I don't know what kind of computer this will
-    be run on), this at least allows a good chance the data will be loaded
-    albeit in chunks and potentially slowly.
+    Documents are stored with their DOI as the ID. Only new articles and
+    articles whose abstract or metadata changed are (re-)embedded and
+    upserted, and articles no longer in the journal data (or stored without a
+    DOI ID by older versions of this code) are deleted. Abstracts are embedded
+    with OllamaBatchEmbeddings, so unchanged abstracts come from the
+    embedding cache.
 
     Args:
         journal_data (pd.DataFrame): Journal data
@@ -146,37 +202,40 @@ def create_vectordb(journal_data: pd.DataFrame, model: str) -> Chroma:
         Chroma: Chroma vector database object
     """
 
-    n_partitions = journal_data.shape[0] // 10
-    if n_partitions == 0:
-        n_partitions = 1
-
-    partitions = np.array_split(journal_data, n_partitions)
+    journal_db = load_vectordb(model)
+    documents = get_vectordb_documents(journal_data)
+    metadata_columns = [c for c in documents.columns if c != "Abstract_clean"]
 
-    embeddings = OllamaEmbeddings(model=model)
-    journal_db = Chroma(
-        embedding_function=embeddings,
-        collection_name="journal_embeddings",
-        persist_directory=str(VECTORDB_DIRECTORY),
+    stored = get_collection(journal_db).get(include=["documents", "metadatas"])
+    stored_documents = dict(
+        zip(stored["ids"], zip(stored["documents"], stored["metadatas"]))
     )
 
-    for partition in tqdm.tqdm(partitions, desc="Adding documents to database"):
-        journal_data_loader = DataFrameLoader(
-            partition, page_content_column="Abstract_clean"
-        )
-        journal_dataloader = journal_data_loader.load()
-        attempts = 0
-        while attempts < 5:
-            try:
-                journal_db.add_documents(journal_dataloader)
-                break
-            except ollama._types.ResponseError as e:
-                attempts += 1
-                if attempts > 5:
-                    raise e
-                print(f"\nError adding documents to database: {e}")
-                print("This often happens when the Ollama server is busy.")
-                print(f"Waiting 20 seconds before retrying...{attempts} of 5")
-                sleep(20)
+    upserts = []
+    for doi, text, metadata in zip(
+        documents.index,
+        documents["Abstract_clean"],
+        documents[metadata_columns].to_dict(orient="records"),
+    ):
+        # Missing values are left out: NaN never equals the stored NaN, so the
+        # document would be upserted on every sync, and Chroma rejects None
+        metadata = {key: value for key, value in metadata.items() if pd.notna(value)}
+        if stored_documents.get(doi) != (text, metadata):
+            upserts.append((doi, text, metadata))
+    deletes = [doi for doi in stored_documents if doi not in documents.index]
+
+    print(
+        f"{len(documents) - len(upserts)} documents unchanged, "
+        f"{len(upserts)} to add or update, {len(deletes)} to delete"
+    )
+    for start in range(0, len(deletes), ADD_BATCH_SIZE):
+        journal_db.delete(ids=deletes[start : start + ADD_BATCH_SIZE])
+    for start in tqdm.tqdm(
+        range(0, len(upserts), ADD_BATCH_SIZE),
+        desc="Adding documents to database",
+    ):
+        ids, texts, metadatas = zip(*upserts[start : start + ADD_BATCH_SIZE])
+        journal_db.add_texts(list(texts), metadatas=list(metadatas), ids=list(ids))
 
     return journal_db
 
@@ -190,15 +249,79 @@ def load_vectordb(model: str) -> Chroma:
     Returns:
         Chroma: Chroma vector database object
     """
-    embeddings = OllamaEmbeddings(model=model)
     journal_db = Chroma(
         collection_name="journal_embeddings",
-        embedding_function=embeddings,
+        embedding_function=get_embeddings(model),
         persist_directory=str(VECTORDB_DIRECTORY),
     )
     return journal_db
 
 
+def get_collection(db: Chroma) -> chromadb.Collection:
+    """Get the Chroma collection behind a vector database object
+
+    langchain_chroma doesn't expose a public way to get stored embeddings or
+    to query by embedding with distances, so this uses its private
+    _collection attribute. Keeping every such access here means a change to
+    langchain_chroma's internals only needs fixing in one place.
+
+    Args:
+        db (Chroma): Chroma vector database object
+
+    Returns:
+        chromadb.Collection: The underlying chromadb collection
+    """
+
+    return db._collection
+
+
+def search_vectordb(
+    db: Chroma, query_embedding: List[float], k: int = 5
+) -> pd.DataFrame:
+    """Find the documents most similar to an embedding
+
+    The documents' stored embeddings are returned with the results, so they
+    don't need to be embedded again to compare them with the query. Chroma
+    finds the k nearest documents by its own Distance (L2 by default), which
+    can rank embeddings that aren't normalized differently from cosine
+    similarity, so the results are sorted by Similarity.
+
+    Args:
+        db (Chroma): Chroma vector database object
+        query_embedding (List[float]): Embedding to search with
+        k (int, optional): Number of documents. Defaults to 5.
+
+    Returns:
+        pd.DataFrame: Metadata, Abstract, Embedding, Distance (from Chroma) and
+            cosine Similarity to the query of each document, highest
+            Similarity first (empty if the database has no documents)
+    """
+
+    results = get_collection(db).query(
+        query_embeddings=[query_embedding],
+        n_results=k,
+        include=["embeddings", "documents", "metadatas", "distances"],
+    )
+    if not results["ids"][0]:
+        return pd.DataFrame(
+            columns=["Title", "Abstract", "Distance", "Embedding", "Similarity"]
+        )
+
+    df = pd.DataFrame(results["metadatas"][0], index=results["ids"][0])
+    df["Abstract"] = results["documents"][0]
+    df["Distance"] = results["distances"][0]
+
+    embeddings = np.asarray(results["embeddings"][0], dtype="float64").reshape(
+        len(df), -1
+    )
+    query = np.asarray(query_embedding, dtype="float64")
+    norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+    df["Embedding"] = list(embeddings)
+    df["Similarity"] = embeddings @ query / np.where(norms > 0, norms, 1)
+
+    return df.sort_values("Similarity", ascending=False, kind="stable")
+
+
 def generate_journal_summary_embeddings(db: Chroma) -> pd.DataFrame:
     """Generate journal summary embeddings
 
@@ -209,7 +332,7 @@ def generate_journal_summary_embeddings(db: Chroma) -> pd.DataFrame:
         pd.DataFrame: Journal summary embeddings
     """
 
-    results = db._collection.get(include=["embeddings", "metadatas"])
+    results = get_collection(db).get(include=["embeddings", "metadatas"])
     df = pd.DataFrame(
         zip([data["Journal"] for data in results["metadatas"]], results["embeddings"]),
         columns=["Journal", "Embedding"],
@@ -234,11 +357,11 @@ def reduce_dimensions_tsne(db: Chroma) -> pd.DataFrame:
         pd.DataFrame: Journal data with t-SNE embeddings
         TSNE: fitted t-SNE model
     """
-    results = db._collection.get(include=["embeddings", "metadatas"])
+    results = get_collection(db).get(include=["embeddings", "metadatas"])
     df = pd.DataFrame(
         zip(
             [data["Journal"] for data in results["metadatas"]],
-            [data["Title"] for data in results["metadatas"]],
+            [data.get("Title") for data in results["metadatas"]],
             results["embeddings"],
         ),
         columns=["Journal", "Title", "Embedding"],
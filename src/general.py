@@ -1,34 +1,48 @@
 """General use functions"""
 
-import json
+import hashlib
+import shutil
 from pathlib import Path
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import nltk
 import pandas as pd
 import spacy
 
+import src.config as cfg
+
 DATA_DIRECTORY = Path(__file__).parents[1] / "data"
 DATA_DIRECTORY.mkdir(exist_ok=True)
 OUTPUT_DIRECTORY = Path(__file__).parents[1] / "output"
 OUTPUT_DIRECTORY.mkdir(exist_ok=True)
 
-AUTHOR_DATA_FILE = DATA_DIRECTORY / "author_publications.pkl"
-JOURNAL_DATA_FILE = DATA_DIRECTORY / "journal_publications.pkl"
+# Parquet datasets, partitioned into a folder per journal and publication year
+AUTHOR_DATASET = DATA_DIRECTORY / "author_publications"
+JOURNAL_DATASET = DATA_DIRECTORY / "journal_publications"
+PARTITION_COLUMNS = ["Journal", "Pub Date"]
+
+# Whole-file pickles used before the Parquet datasets; read if no dataset exists
+LEGACY_AUTHOR_DATA_FILE = DATA_DIRECTORY / "author_publications.pkl"
+LEGACY_JOURNAL_DATA_FILE = DATA_DIRECTORY / "journal_publications.pkl"
 
 
 def get_settings() -> dict:
-    """Get settings from settings.json"""
+    """Get settings from settings.json (see src.config for the validated version)"""
 
-    settings_file = Path(__file__).parents[1] / "settings.json"
-    assert settings_file.exists(), f"Settings file not found at {settings_file}"
+    return cfg.get_config().raw
 
-    with open(settings_file, encoding="utf8") as infile:
-        json_data = infile.read()
 
-    assert json_data, "No data in settings.json"
+def hash_text(text: str) -> str:
+    """Get the content hash of a text (the NLP and embedding cache key)
 
-    return json.loads(json_data)
+    Args:
+        text (str): Text
+
+    Returns:
+        str: Hex digest of the text
+    """
+
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
 
 
 def check_download_models() -> None:
@@ -41,6 +55,82 @@ def check_download_models() -> None:
         spacy.cli.download("en_core_web_sm", False, False, "--quiet")
 
 
+def load_dataset(
+    dataset: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Tuple]] = None,
+) -> pd.DataFrame:
+    """Load a Parquet dataset into memory
+
+    Only the requested columns are read, and filters on the partition columns
+    skip whole journal/year folders without opening them.
+
+    Args:
+        dataset (Path): Dataset directory
+        columns (Optional[List[str]]): Columns to read. Defaults to all columns.
+        filters (Optional[List[Tuple]]): Row filters, e.g.
+            [("Pub Date", "<", 2024)]. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Data
+    """
+
+    legacy_files = {
+        AUTHOR_DATASET: LEGACY_AUTHOR_DATA_FILE,
+        JOURNAL_DATASET: LEGACY_JOURNAL_DATA_FILE,
+    }
+    if not dataset.exists() and legacy_files.get(dataset, dataset).exists():
+        print(f"Converting {legacy_files[dataset]} to a Parquet dataset")
+        save_dataset(pd.read_pickle(legacy_files[dataset]), dataset)
+
+    assert dataset.exists(), f"Data file not found at {dataset}"
+
+    data = pd.read_parquet(dataset, columns=columns, filters=filters)
+
+    # Partition columns are read back as categories
+    if "Journal" in data:
+        data["Journal"] = data["Journal"].astype(str)
+    if "Pub Date" in data:
+        data["Pub Date"] = data["Pub Date"].astype("int64")
+
+    return data
+
+
+def save_dataset(data: pd.DataFrame, dataset: Path) -> None:
+    """Save data to a Parquet dataset, replacing any existing dataset
+
+    Args:
+        data (pd.DataFrame): Data
+        dataset (Path): Dataset directory
+    """
+
+    temp_dataset = dataset.with_name(f"{dataset.name}.tmp")
+    if temp_dataset.exists():
+        shutil.rmtree(temp_dataset)
+
+    data.to_parquet(temp_dataset, partition_cols=PARTITION_COLUMNS, index=False)
+
+    if dataset.exists():
+        shutil.rmtree(dataset)
+    temp_dataset.rename(dataset)
+
+
+def load_author_data(
+    columns: Optional[List[str]] = None, filters: Optional[List[Tuple]] = None
+) -> pd.DataFrame:
+    """Load the author data (see load_dataset)"""
+
+    return load_dataset(AUTHOR_DATASET, columns, filters)
+
+
+def load_journal_data(
+    columns: Optional[List[str]] = None, filters: Optional[List[Tuple]] = None
+) -> pd.DataFrame:
+    """Load the journal data (see load_dataset)"""
+
+    return load_dataset(JOURNAL_DATASET, columns, filters)
+
+
 def load_data_files() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Check that data files exist and load them into memory
 
@@ -49,17 +139,7 @@ def load_data_files() -> Tuple[pd.DataFrame, pd.DataFrame]:
         pd.DataFrame: Journal data
     """
 
-    assert (
-        AUTHOR_DATA_FILE.exists()
-    ), f"Author data file not found at {AUTHOR_DATA_FILE}"
-    assert (
-        JOURNAL_DATA_FILE.exists()
-    ), f"Journal data file not found at {JOURNAL_DATA_FILE}"
-
-    author_data = pd.read_pickle(AUTHOR_DATA_FILE)
-    journal_data = pd.read_pickle(JOURNAL_DATA_FILE)
-
-    return author_data, journal_data
+    return load_author_data(), load_journal_data()
 
 
 def save_data_files(author_data: pd.DataFrame, journal_data: pd.DataFrame) -> None:
@@ -70,5 +150,5 @@ def save_data_files(author_data: pd.DataFrame, journal_data: pd.DataFrame) -> No
         journal_data (pd.DataFrame): Journal data
     """
 
-    author_data.to_pickle(AUTHOR_DATA_FILE)
-    journal_data.to_pickle(JOURNAL_DATA_FILE)
+    save_dataset(author_data, AUTHOR_DATASET)
+    save_dataset(journal_data, JOURNAL_DATASET)
@@ -0,0 +1,199 @@
+"""Batched, concurrent client for Ollama's /api/embed endpoint"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+import httpx
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+MAX_CONCURRENCY = 4
+INITIAL_BATCH_SIZE = 16
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 512
+# Batches are grown while requests are faster than this and shrunk otherwise
+TARGET_LATENCY = 10.0
+TIMEOUT = 120.0
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+def get_ollama_host(host: Optional[str] = None) -> str:
+    """Get the Ollama server's base URL
+
+    Args:
+        host (Optional[str]): Base URL. Defaults to None (the OLLAMA_HOST
+            environment variable, or DEFAULT_HOST if it isn't set).
+
+    Returns:
+        str: Base URL including the scheme
+    """
+
+    host = host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+
+class OllamaEmbedClient:
+    """Embeds texts with several /api/embed requests in flight at a time
+
+    The batch size adapts to the server: it grows by INITIAL_BATCH_SIZE after
+    each request faster than the target latency and halves after a slow or
+    failed request (additive increase, multiplicative decrease). Failed
+    requests are retried after a jittered, exponentially increasing wait.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        host: Optional[str] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        batch_size: int = INITIAL_BATCH_SIZE,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        target_latency: float = TARGET_LATENCY,
+        timeout: float = TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+    ):
+        """Create the client
+
+        Args:
+            model (str): Ollama model
+            host (Optional[str]): Base URL. Defaults to None (OLLAMA_HOST or
+                DEFAULT_HOST).
+            max_concurrency (int): Requests in flight at a time. Defaults to
+                MAX_CONCURRENCY.
+            batch_size (int): Starting batch size. Defaults to
+                INITIAL_BATCH_SIZE.
+            max_batch_size (int): Largest batch size. Defaults to
+                MAX_BATCH_SIZE.
+            target_latency (float): Seconds per request to aim for. Defaults
+                to TARGET_LATENCY.
+            timeout (float): Seconds to wait for a request. Defaults to
+                TIMEOUT.
+            max_retries (int): Retries of a failed request. Defaults to
+                MAX_RETRIES.
+        """
+
+        self.model = model
+        self.host = get_ollama_host(host)
+        self.max_concurrency = max_concurrency
+        self.batch_step = batch_size
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.client = httpx.Client(
+            base_url=self.host,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+
+    def close(self) -> None:
+        """Close the client's connections"""
+
+        self.client.close()
+
+    def __enter__(self) -> "OllamaEmbedClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def adapt_batch_size(self, latency: Optional[float]) -> None:
+        """Grow or shrink the batch size after a request
+
+        Args:
+            latency (Optional[float]): Seconds the request took, or None if it
+                failed
+        """
+        with self.lock:
+            if latency is not None and latency <= self.target_latency:
+                self.batch_size = min(
+                    self.batch_size + self.batch_step, self.max_batch_size
+                )
+            else:
+                self.batch_size = max(self.batch_size // 2, MIN_BATCH_SIZE)
+
+    def get_backoff(self, attempt: int) -> float:
+        """Get the seconds to wait before retrying (full jitter)
+
+        Args:
+            attempt (int): Number of failed attempts so far
+
+        Returns:
+            float: Seconds to wait
+        """
+
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts with one request, retrying if it fails
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: Embedding for each text
+        """
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.client.post(
+                    "/api/embed", json={"model": self.model, "input": texts}
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    embeddings = response.json()["embeddings"]
+                    assert len(embeddings) == len(
+                        texts
+                    ), "Ollama returned the wrong number of embeddings"
+                    self.adapt_batch_size(time.perf_counter() - start)
+                    return embeddings
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.TransportError as e:
+                error = repr(e)
+
+            self.adapt_batch_size(None)
+            attempt += 1
+            if attempt > self.max_retries:
+                raise RuntimeError(
+                    f"Embedding request failed {attempt} times, last error: {error}"
+                )
+            time.sleep(self.get_backoff(attempt))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in adaptively sized batches, several at a time
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: Embedding for each text (same order as texts)
+        """
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        position = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = {}
+            while position < len(texts) or pending:
+                while position < len(texts) and len(pending) < self.max_concurrency:
+                    batch = texts[position : position + self.batch_size]
+                    pending[executor.submit(self.embed_batch, batch)] = position
+                    position += len(batch)
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = pending.pop(future)
+                    batch_embeddings = future.result()
+                    embeddings[start : start + len(batch_embeddings)] = batch_embeddings
+
+        return embeddings
@@ -1,13 +1,49 @@
 """Preprocessing module for text data"""
 
-from typing import List
+import hashlib
+import itertools
+import multiprocessing
+import os
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import nltk
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import spacy
+from gensim.models.phrases import FrozenPhrases, Phrases
+from spacy.attrs import LEMMA, ORTH, POS
+from spacy.parts_of_speech import IDS as POS_IDS
 
+import src.config as cfg
 import src.general as gen
 
+# Python's regex parser, used to find the literal text a regex requires
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+SPACY_MODEL = "en_core_web_sm"
+# preprocess_docs only uses part-of-speech tags and lemmas, which come from the
+# tagger, attribute_ruler and lemmatizer; the parser and NER are never used
+UNUSED_COMPONENTS = ["parser", "ner"]
+N_PROCESS = max(1, (os.cpu_count() or 1) - 1)
+BATCH_SIZE = 256
+NLP_CACHE_DIRECTORY = gen.DATA_DIRECTORY / "nlp_cache"
+NLP_CACHE_SCHEMA = pa.schema([("Hash", pa.string()), ("Tokens", pa.list_(pa.string()))])
+# The cache is compacted into one file once a run would leave more than this
+MAX_NLP_CACHE_PARTS = 8
+PHRASE_MIN_COUNT = 3
+PHRASE_THRESHOLD = 10
+PHRASE_BATCH_SIZE = 10_000
+# Non-word characters (punctuation, symbols, numbers, etc.)
+NONWORD_POS = ["PUNCT", "SYM", "NUM", "X", "PART"]
+
 
 def get_stopwords() -> List[str]:
     """Get list of stopwords from NLTK and custom words from settings
@@ -18,43 +54,385 @@ def get_stopwords() -> List[str]:
 
     stops = nltk.corpus.stopwords.words("english")
 
-    settings = gen.get_settings()
-    assert "Custom Stopwords" in settings, "Custom Stopwords not in settings.json"
+    return list(cfg.get_config().custom_stopwords) + stops
+
+
+def load_nlp() -> spacy.language.Language:
+    """Load the spaCy pipeline without the components preprocessing doesn't use
+
+    Returns:
+        spacy.language.Language: spaCy pipeline
+    """
+
+    return spacy.load(SPACY_MODEL, exclude=UNUSED_COMPONENTS)
+
+
+def parse_texts(
+    nlp: spacy.language.Language,
+    texts: Iterable[str],
+    n_process: int = N_PROCESS,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[spacy.tokens.Doc]:
+    """Parse texts with spaCy, streaming the docs as they are ready
+
+    Docs are yielded one at a time (in the same order as texts) so the whole
+    corpus never has to be held in memory as Doc objects. The parsing rate is
+    printed once all texts are parsed.
+
+    Args:
+        nlp (spacy.language.Language): spaCy pipeline
+        texts (Iterable[str]): Texts to parse
+        n_process (int): Number of processes to parse with. Defaults to all
+            but one CPU core.
+        batch_size (int): Number of texts sent to a process at a time.
+            Defaults to BATCH_SIZE.
+
+    Yields:
+        spacy.tokens.Doc: Parsed text
+    """
+
+    start = time.perf_counter()
+    n_docs = 0
+    for doc in nlp.pipe(texts, n_process=n_process, batch_size=batch_size):
+        n_docs += 1
+        yield doc
+
+    elapsed = time.perf_counter() - start
+    rate = n_docs / elapsed if elapsed else 0
+    print(f"Parsed {n_docs} docs in {elapsed:.1f} seconds ({rate:.1f} docs/sec)")
+
+
+def compile_token_filter(
+    remove_stops: bool, remove_nwcs: bool, lemmatize: bool
+) -> Callable[[spacy.tokens.Doc], List[str]]:
+    """Build the token filter used by preprocess_docs
 
-    return settings["Custom Stopwords"] + stops
+    Everything that doesn't depend on the doc is worked out once: stopwords
+    go into a frozenset, excluded parts of speech become an array of POS IDs,
+    and each distinct word (by its spaCy string hash) is checked for length
+    and stopwords only the first time it is seen.
+
+    Args:
+        remove_stops (bool): Remove stopwords
+        remove_nwcs (bool): Remove non-word characters (punctuation, etc.)
+        lemmatize (bool): Use lemmas instead of the original words
+
+    Returns:
+        Callable[[spacy.tokens.Doc], List[str]]: Function returning a doc's
+            preprocessed tokens
+    """
+
+    stopwords = frozenset(get_stopwords()) if remove_stops else frozenset()
+    excluded_pos = np.array(
+        [POS_IDS[pos] for pos in NONWORD_POS] if remove_nwcs else [],
+        dtype="uint64",
+    )
+    word_attr = LEMMA if lemmatize else ORTH
+    word_cache: Dict[int, Optional[str]] = {}
+
+    def get_word(key: int, strings: spacy.strings.StringStore) -> Optional[str]:
+        if key not in word_cache:
+            text = strings[key]
+            lowered = text.lower()
+            if len(text) <= 2 or lowered in stopwords:
+                word_cache[key] = None
+            else:
+                word_cache[key] = lowered.strip()
+        return word_cache[key]
+
+    def token_filter(doc: spacy.tokens.Doc) -> List[str]:
+        array = doc.to_array([POS, word_attr])
+        keys = array[~np.isin(array[:, 0], excluded_pos), 1].tolist()
+        strings = doc.vocab.strings
+        words = (get_word(key, strings) for key in keys)
+        return [word for word in words if word is not None]
+
+    return token_filter
 
 
 def preprocess_docs(
-    docs: List[spacy.tokens.Doc],
+    docs: Iterable[spacy.tokens.Doc],
     remove_stops: bool,
     remove_nwcs: bool,
     lemmatize: bool,
 ) -> List[List[str]]:
     """Preprocesses docs"""
 
-    stopwords = get_stopwords()
+    token_filter = compile_token_filter(remove_stops, remove_nwcs, lemmatize)
 
-    preprocessed = []
-    for doc in docs:
-        preprocessed_doc = []
-        for token in doc:
-            if remove_nwcs and token.pos_ in ["PUNCT", "SYM", "NUM", "X", "PART"]:
-                continue
-            if lemmatize:
-                if len(token.lemma_) <= 2:
-                    continue
-                if remove_stops and token.lemma_.lower() in stopwords:
-                    continue
-                preprocessed_doc.append(token.lemma_.lower().strip())
-            else:
-                if len(token.text) <= 2:
-                    continue
-                if remove_stops and token.text.lower() in stopwords:
-                    continue
-                preprocessed_doc.append(token.text.lower().strip())
-        preprocessed.append(preprocessed_doc)
+    return [token_filter(doc) for doc in docs]
+
+
+def get_nlp_cache_directory(
+    remove_stops: bool, remove_nwcs: bool, lemmatize: bool
+) -> Path:
+    """Get the cache directory for the current model and preprocessing options
+
+    Cached tokens are only valid for the spaCy model/version, pipeline and
+    token filter (including stopwords) that produced them, so each
+    combination gets its own directory.
+
+    Args:
+        remove_stops (bool): Remove stopwords
+        remove_nwcs (bool): Remove non-word characters (punctuation, etc.)
+        lemmatize (bool): Use lemmas instead of the original words
+
+    Returns:
+        Path: Cache directory
+    """
+
+    namespace = "|".join(
+        [
+            SPACY_MODEL,
+            str(spacy.util.get_package_version(SPACY_MODEL)),
+            spacy.__version__,
+            ",".join(UNUSED_COMPONENTS),
+            f"{remove_stops},{remove_nwcs},{lemmatize}",
+            ",".join(sorted(set(get_stopwords()))) if remove_stops else "",
+        ]
+    )
+    namespace_hash = hashlib.sha256(namespace.encode("utf8")).hexdigest()[:16]
+    return NLP_CACHE_DIRECTORY / namespace_hash
+
+
+def write_nlp_cache_part(
+    cache_directory: Path, hashes: List[str], tokens: List[List[str]]
+) -> None:
+    """Add a part file to the NLP cache
+
+    The file is written under a hidden name (ignored when the cache is read)
+    and then renamed, so an interrupted write never leaves a partial part.
+
+    Args:
+        cache_directory (Path): Cache directory
+        hashes (List[str]): Hashes of the texts
+        tokens (List[List[str]]): Preprocessed tokens of each text
+    """
+
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    part = cache_directory / f"part-{time.time_ns()}.parquet"
+    temp_part = cache_directory / f".{part.name}"
+    pd.DataFrame({"Hash": hashes, "Tokens": tokens}).to_parquet(
+        temp_part, index=False, schema=NLP_CACHE_SCHEMA
+    )
+    temp_part.replace(part)
+
+
+def preprocess_texts(
+    texts: pd.Series, remove_stops: bool, remove_nwcs: bool, lemmatize: bool
+) -> List[List[str]]:
+    """Parse and preprocess texts, reusing cached results
+
+    Preprocessed tokens are cached on disk by a hash of each text, so only
+    texts that have not been preprocessed before (with the same model and
+    options) are parsed with spaCy. Only the cached rows for these texts are
+    read. Each run adds a part file with its new texts; once there are more
+    than MAX_NLP_CACHE_PARTS, the cache is rewritten as one file holding just
+    these texts, which drops entries for abstracts that were since edited or
+    removed.
+
+    Args:
+        texts (pd.Series): Texts to preprocess
+        remove_stops (bool): Remove stopwords
+        remove_nwcs (bool): Remove non-word characters (punctuation, etc.)
+        lemmatize (bool): Use lemmas instead of the original words
+
+    Returns:
+        List[List[str]]: Preprocessed tokens for each text
+    """
+
+    cache_directory = get_nlp_cache_directory(remove_stops, remove_nwcs, lemmatize)
+    hashes = [gen.hash_text(text) for text in texts]
+    old_parts = sorted(cache_directory.glob("part-*.parquet"))
+    cache: Dict[str, List[str]] = {}
+    if old_parts and hashes:
+        cached = pd.read_parquet(
+            cache_directory,
+            columns=["Hash", "Tokens"],
+            filters=[("Hash", "in", list(set(hashes)))],
+        )
+        cache = dict(zip(cached["Hash"], cached["Tokens"].map(list)))
+
+    new_texts = {h: text for h, text in zip(hashes, texts) if h not in cache}
+    n_unique = len(set(hashes))
+    print(f"{n_unique - len(new_texts)} of {n_unique} unique texts found in cache")
+
+    if new_texts:
+        docs = parse_texts(load_nlp(), new_texts.values())
+        new_tokens = preprocess_docs(docs, remove_stops, remove_nwcs, lemmatize)
+        cache.update(zip(new_texts.keys(), new_tokens))
+
+    if len(old_parts) + bool(new_texts) > MAX_NLP_CACHE_PARTS:
+        print(f"Compacting {len(old_parts)} NLP cache files into one")
+        write_nlp_cache_part(cache_directory, list(cache), list(cache.values()))
+        for part in old_parts:
+            part.unlink()
+    elif new_texts:
+        write_nlp_cache_part(cache_directory, list(new_texts), new_tokens)
+
+    return [cache[h] for h in hashes]
+
+
+def preprocess_corpora(
+    corpora: List[pd.Series], remove_stops: bool, remove_nwcs: bool, lemmatize: bool
+) -> List[List[List[str]]]:
+    """Preprocess several corpora, preprocessing each distinct text once
+
+    Texts that appear in more than one corpus (or more than once in a corpus)
+    are parsed a single time and their tokens are shared.
+
+    Args:
+        corpora (List[pd.Series]): Texts of each corpus
+        remove_stops (bool): Remove stopwords
+        remove_nwcs (bool): Remove non-word characters (punctuation, etc.)
+        lemmatize (bool): Use lemmas instead of the original words
+
+    Returns:
+        List[List[List[str]]]: Preprocessed tokens for each text of each corpus
+    """
+
+    unique_texts = pd.concat(corpora, ignore_index=True).drop_duplicates()
+    tokens = dict(
+        zip(
+            unique_texts,
+            preprocess_texts(unique_texts, remove_stops, remove_nwcs, lemmatize),
+        )
+    )
+
+    return [[tokens[text] for text in corpus] for corpus in corpora]
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most batch_size items
+
+    Args:
+        items (Iterable): Items to batch
+        batch_size (int): Maximum number of items in a batch
+
+    Yields:
+        list: Batch of items
+    """
 
-    return preprocessed
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def train_phrases(
+    sentences: Iterable[List[str]],
+    min_count: int = PHRASE_MIN_COUNT,
+    threshold: float = PHRASE_THRESHOLD,
+    batch_size: int = PHRASE_BATCH_SIZE,
+) -> FrozenPhrases:
+    """Train a phrase (bigram) model from a stream of tokenized texts
+
+    Vocabulary counts are added one batch at a time, so sentences can be a
+    generator over a corpus that doesn't fit in memory. The trained model is
+    frozen, which drops the vocabulary counts and keeps only the phrases.
+
+    Args:
+        sentences (Iterable[List[str]]): Tokenized texts
+        min_count (int): Minimum count of a bigram to be a phrase. Defaults to
+            PHRASE_MIN_COUNT.
+        threshold (float): Minimum score of a bigram to be a phrase. Defaults
+            to PHRASE_THRESHOLD.
+        batch_size (int): Number of texts counted at a time. Defaults to
+            PHRASE_BATCH_SIZE.
+
+    Returns:
+        FrozenPhrases: Frozen phrase model
+    """
+
+    phrases = Phrases(min_count=min_count, threshold=threshold)
+    for batch in iter_batches(sentences, batch_size):
+        phrases.add_vocab(batch)
+
+    return phrases.freeze()
+
+
+PHRASE_MODEL: Optional[FrozenPhrases] = None
+
+
+def init_phrase_worker(phrases: FrozenPhrases) -> None:
+    """Give a worker process the phrase model used by apply_phrase_model"""
+    global PHRASE_MODEL
+
+    PHRASE_MODEL = phrases
+
+
+def apply_phrase_model(batch: List[List[str]]) -> List[List[str]]:
+    """Join phrases in a batch of tokenized texts in a worker process"""
+
+    return [PHRASE_MODEL[sentence] for sentence in batch]
+
+
+def apply_phrases(
+    phrases: FrozenPhrases,
+    sentences: Iterable[List[str]],
+    n_process: int = 1,
+    batch_size: int = PHRASE_BATCH_SIZE,
+) -> Iterator[List[str]]:
+    """Join the phrases in tokenized texts, streaming the results
+
+    Args:
+        phrases (FrozenPhrases): Frozen phrase model
+        sentences (Iterable[List[str]]): Tokenized texts
+        n_process (int): Number of processes to apply the model with. Defaults
+            to 1 (no worker processes).
+        batch_size (int): Number of texts sent to a process at a time.
+            Defaults to PHRASE_BATCH_SIZE.
+
+    Yields:
+        List[str]: Tokens with phrases joined by "_" (same order as sentences)
+    """
+
+    if n_process <= 1:
+        for sentence in sentences:
+            yield phrases[sentence]
+        return
+
+    with multiprocessing.Pool(
+        n_process, initializer=init_phrase_worker, initargs=(phrases,)
+    ) as pool:
+        for batch in pool.imap(
+            apply_phrase_model, iter_batches(sentences, batch_size)
+        ):
+            yield from batch
+
+
+@lru_cache(maxsize=None)
+def compile_title_exclusion_regex(terms: Tuple[str, ...]) -> re.Pattern:
+    """Compile the excluded title terms into one case-insensitive regex
+
+    Args:
+        terms (Tuple[str, ...]): Excluded title terms from settings.json
+
+    Returns:
+        re.Pattern: Regex capturing the first excluded term in a title
+    """
+
+    return re.compile(
+        "(" + "|".join(re.escape(term) for term in terms) + ")", re.IGNORECASE
+    )
+
+
+def get_title_exclusion_reasons(titles: pd.Series) -> pd.Series:
+    """Find titles of publications that aren't research articles
+
+    Args:
+        titles (pd.Series): Publication titles
+
+    Returns:
+        pd.Series: Excluded term found in each title (lower case), or NaN if
+            the title has none
+    """
+
+    terms = cfg.get_config().excluded_title_terms
+    if not terms:
+        return pd.Series(float("nan"), index=titles.index, dtype=object)
+
+    regex = compile_title_exclusion_regex(terms)
+    return titles.str.extract(regex, expand=False).str.lower()
 
 
 def get_noncontent_regexes() -> List[str]:
@@ -64,18 +442,119 @@ def get_noncontent_regexes() -> List[str]:
         List[str]: List of regex strings from settings.json
     """
 
-    settings = gen.get_settings()
-    assert "Non-content Regexes" in settings, "Non-content Regexes not in settings.json"
+    return list(cfg.get_config().noncontent_regexes)
 
-    return settings["Non-content Regexes"]
 
+def get_required_literal(parsed: sre_parse.SubPattern) -> str:
+    """Get the longest literal text that every match of a parsed regex contains
 
-def remove_noncontent_statements(texts: pd.Series) -> pd.Series:
-    """Removes non-content statements from abstracts"""
+    Args:
+        parsed (sre_parse.SubPattern): Parsed regex
+
+    Returns:
+        str: Required literal text ("" if there is none)
+    """
 
-    regexes = get_noncontent_regexes()
+    best, run = "", ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+
+        best, run = max(best, run, key=len), ""
+        if op is sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            best = max(best, get_required_literal(av[-1]), key=len)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            best = max(best, get_required_literal(av[2]), key=len)
+
+    return max(best, run, key=len)
+
+
+@lru_cache(maxsize=None)
+def compile_noncontent_regexes(
+    regexes: Tuple[str, ...]
+) -> Tuple[Tuple[str, re.Pattern], ...]:
+    """Compile the non-content regexes (once per set of regexes)
+
+    Each regex is paired with literal text that all of its matches contain,
+    so it is only run on texts containing that literal.
+
+    Args:
+        regexes (Tuple[str, ...]): Regex strings from settings.json
+
+    Returns:
+        Tuple[Tuple[str, re.Pattern], ...]: Required literal and compiled
+            regex for each regex
+    """
 
-    for regex_str in regexes:
-        texts = texts.replace(regex_str, "", regex=True)
+    compiled = []
+    for regex in regexes:
+        parsed = sre_parse.parse(regex)
+        literal = ""
+        if not parsed.state.flags & re.IGNORECASE:
+            literal = get_required_literal(parsed)
+        compiled.append((literal, re.compile(regex)))
+
+    return tuple(compiled)
+
+
+def clean_noncontent_statements(texts: pd.Series) -> Tuple[pd.Series, pd.DataFrame]:
+    """Removes non-content statements from abstracts and reports which fired
+
+    All regexes are applied to each text in one pass over the corpus, in the
+    settings.json order, so the results match applying each regex to the
+    whole corpus in turn. A regex is skipped for a text (a substring check
+    rather than a regex search) unless the text contains the literal text
+    that all of the regex's matches contain. Values that aren't strings
+    (e.g., missing abstracts) are left as they are, so a missing abstract
+    stays None/NaN rather than becoming the string "nan" as it did with
+    Series.replace and .astype(str). 2_preprocess_abstracts.py drops them.
+
+    Args:
+        texts (pd.Series): Abstracts
+
+    Returns:
+        pd.Series: Cleaned abstracts
+        pd.DataFrame: For each regex, the number of texts it changed, the
+            number of matches removed, and the seconds spent applying it
+    """
+
+    regexes = tuple(get_noncontent_regexes())
+    compiled = compile_noncontent_regexes(regexes)
+    n_texts = [0] * len(compiled)
+    n_matches = [0] * len(compiled)
+    seconds = [0.0] * len(compiled)
+
+    def clean(text):
+        if not isinstance(text, str):
+            return text
+        for i, (literal, regex) in enumerate(compiled):
+            if literal not in text:
+                continue
+            start = time.perf_counter()
+            text, n = regex.subn("", text)
+            seconds[i] += time.perf_counter() - start
+            if n:
+                n_texts[i] += 1
+                n_matches[i] += n
+        return text
+
+    cleaned = pd.Series(
+        [clean(text) for text in texts], index=texts.index, dtype=object
+    )
+    hits = pd.DataFrame(
+        {
+            "Regex": regexes,
+            "Texts": n_texts,
+            "Matches": n_matches,
+            "Seconds": seconds,
+        }
+    )
+
+    return cleaned, hits
+
+
+def remove_noncontent_statements(texts: pd.Series) -> pd.Series:
+    """Removes non-content statements from abstracts"""
 
-    return texts
+    return clean_noncontent_statements(texts)[0]
@@ -0,0 +1,226 @@
+"""Scattertext report rendering"""
+
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import scattertext as st
+
+import src.general as gen
+
+MAX_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+TEXT_COLUMN = "Abstract_bigram_ws"
+CORPUS_CACHE_DIRECTORY = gen.DATA_DIRECTORY / "scattertext_cache"
+
+# Corpus and explorer arguments shared by every category a worker renders
+WORKER_CORPUS: Optional[st.Corpus] = None
+WORKER_KWARGS: dict = {}
+
+
+def get_corpus_cache_file(
+    data: pd.DataFrame,
+    category_col: str,
+    max_terms: Optional[int],
+    use_non_text_features: bool,
+) -> Path:
+    """Get the cache file for a corpus built from data's texts and categories
+
+    The file name is a fingerprint of the text and category columns' contents,
+    the category column's name, the compaction and the scattertext version,
+    so a corpus is only rebuilt when any of these change.
+
+    Args:
+        data (pd.DataFrame): Corpus data
+        category_col (str): Category column
+        max_terms (Optional[int]): Terms kept by the AssociationCompactor
+        use_non_text_features (bool): AssociationCompactor option
+
+    Returns:
+        Path: Cache file
+    """
+
+    row_hashes = pd.util.hash_pandas_object(
+        data[[TEXT_COLUMN, category_col]], index=False
+    )
+    options = f"{category_col}|{max_terms}|{use_non_text_features}|{st.__version__}"
+    digest = hashlib.sha256(row_hashes.to_numpy().tobytes())
+    digest.update(options.encode("utf8"))
+    return CORPUS_CACHE_DIRECTORY / f"{digest.hexdigest()[:32]}.pkl"
+
+
+def get_corpus(
+    data: pd.DataFrame,
+    category_col: str,
+    max_terms: Optional[int] = 2000,
+    use_non_text_features: bool = False,
+    build: Optional[Callable[[], st.Corpus]] = None,
+) -> st.Corpus:
+    """Get a (compacted) scattertext corpus, reusing a cached one if possible
+
+    Args:
+        data (pd.DataFrame): Corpus data
+        category_col (str): Category column
+        max_terms (Optional[int]): Terms kept by the AssociationCompactor.
+            Defaults to 2000. None to not compact the corpus.
+        use_non_text_features (bool): AssociationCompactor option. Defaults to
+            False (as in st.AssociationCompactor).
+        build (Optional[Callable[[], st.Corpus]]): Builds the uncompacted
+            corpus on a cache miss (e.g., by relabeling another corpus).
+            Defaults to None (build it from data's text column).
+
+    Returns:
+        st.Corpus: Scattertext corpus
+    """
+
+    cache_file = get_corpus_cache_file(
+        data, category_col, max_terms, use_non_text_features
+    )
+    if cache_file.exists():
+        with open(cache_file, "rb") as infile:
+            return pickle.load(infile)
+
+    if build is not None:
+        corpus = build()
+    else:
+        corpus = st.CorpusFromPandas(
+            data,
+            category_col=category_col,
+            text_col=TEXT_COLUMN,
+            nlp=st.whitespace_nlp,
+        ).build()
+    if max_terms is not None:
+        corpus = corpus.compact(
+            st.AssociationCompactor(
+                max_terms, use_non_text_features=use_non_text_features
+            )
+        )
+
+    CORPUS_CACHE_DIRECTORY.mkdir(exist_ok=True)
+    temp_file = cache_file.with_suffix(".tmp")
+    with open(temp_file, "wb") as outfile:
+        pickle.dump(corpus, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    temp_file.replace(cache_file)
+
+    return corpus
+
+
+def render_scattertext(corpus: st.Corpus, output_file: Path, **kwargs) -> None:
+    """Render a scattertext explorer to an HTML file
+
+    Args:
+        corpus (st.Corpus): Scattertext corpus
+        output_file (Path): HTML file to write
+        **kwargs: Arguments for st.produce_scattertext_explorer
+    """
+
+    html = st.produce_scattertext_explorer(corpus, **kwargs)
+    with open(output_file, "wb") as outfile:
+        outfile.write(html.encode("utf-8"))
+
+
+def init_report_worker(corpus: st.Corpus, kwargs: dict) -> None:
+    """Give a worker process the corpus and arguments shared by all categories
+
+    With the fork start method (Linux) the corpus is inherited rather than
+    copied to the worker.
+    """
+    global WORKER_CORPUS, WORKER_KWARGS
+
+    WORKER_CORPUS = corpus
+    WORKER_KWARGS = kwargs
+
+
+def render_category(
+    category: str, not_category_name: str, output_file: Path
+) -> Tuple[str, float]:
+    """Render one category's one-vs-rest scattertext in a worker process
+
+    Args:
+        category (str): Category
+        not_category_name (str): Name for all the other categories
+        output_file (Path): HTML file to write
+
+    Returns:
+        str: Category
+        float: Seconds spent rendering
+    """
+
+    start = time.perf_counter()
+    render_scattertext(
+        WORKER_CORPUS,
+        output_file,
+        category=category,
+        category_name=category,
+        not_category_name=not_category_name,
+        left_gradient_term=f"Less like {category}",
+        right_gradient_term=f"More like {category}",
+        **WORKER_KWARGS,
+    )
+    return category, time.perf_counter() - start
+
+
+def render_one_vs_rest(
+    corpus: st.Corpus,
+    categories: List[str],
+    not_category_name: str,
+    max_workers: int = MAX_WORKERS,
+    **kwargs,
+) -> pd.DataFrame:
+    """Render a one-vs-rest scattertext for each category in parallel
+
+    The corpus is built once by the caller and shared with a pool of worker
+    processes, each rendering whole categories. Progress is printed as
+    categories finish, followed by the slowest categories.
+
+    Args:
+        corpus (st.Corpus): Scattertext corpus
+        categories (List[str]): Categories to render
+        not_category_name (str): Name for all the other categories
+        max_workers (int): Number of worker processes. Defaults to all but one
+            CPU core.
+        **kwargs: Arguments for st.produce_scattertext_explorer shared by all
+            categories
+
+    Returns:
+        pd.DataFrame: Seconds spent rendering each category (slowest first)
+    """
+
+    start = time.perf_counter()
+    timings = []
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(max_workers, len(categories))),
+        initializer=init_report_worker,
+        initargs=(corpus, kwargs),
+    ) as executor:
+        futures = [
+            executor.submit(
+                render_category,
+                category,
+                not_category_name,
+                gen.OUTPUT_DIRECTORY / f"{category}_scattertext.html",
+            )
+            for category in categories
+        ]
+        for i, future in enumerate(as_completed(futures)):
+            category, seconds = future.result()
+            timings.append((category, seconds))
+            print(f">>>> [{i + 1}/{len(categories)}] {category} ({seconds:.1f}s)")
+
+    timings = pd.DataFrame(timings, columns=["Category", "Seconds"]).sort_values(
+        "Seconds", ascending=False, ignore_index=True
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Rendered {len(categories)} scattertexts in {elapsed:.1f} seconds "
+        f"({timings['Seconds'].sum():.1f} seconds of rendering)"
+    )
+    print("Slowest:")
+    for row in timings.head(5).itertuples():
+        print(f"    {row.Category} - {row.Seconds:.1f}s")
+
+    return timings
@@ -0,0 +1,14 @@
+"""Tests for src.config"""
+
+import json
+
+import src.config as config
+
+
+def test_parse_config_defaults_excluded_title_terms():
+    with open(config.SETTINGS_FILE, encoding="utf8") as infile:
+        settings = json.load(infile)
+    del settings["Excluded Title Terms"]
+
+    parsed = config.parse_config(settings)
+    assert parsed.excluded_title_terms == config.DEFAULT_EXCLUDED_TITLE_TERMS
@@ -0,0 +1,142 @@
+"""Tests for src.crossref"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import src.crossref as crossref
+
+ABSTRACTS = [
+    "<jats:p>One paragraph.</jats:p>",
+    "<jats:title>Abstract</jats:title><jats:p>First.</jats:p><jats:p>Second.</jats:p>",
+    '<jats:sec><jats:title>Purpose</jats:title><jats:p id="p1">A &amp; B</jats:p>'
+    "</jats:sec><jats:sec><jats:p>With <jats:italic>italics</jats:italic> and "
+    "<jats:sup>2</jats:sup>.</jats:p></jats:sec>",
+    "<jats:p>Outer <jats:list><jats:list-item><jats:p>inner</jats:p>"
+    "</jats:list-item></jats:list> tail</jats:p>",
+    "<jats:p>Before</jats:p><jats:p>Outer <jats:list><jats:list-item><jats:p>one"
+    "</jats:p></jats:list-item><jats:list-item><jats:p>two</jats:p>"
+    "</jats:list-item></jats:list></jats:p><jats:p>After</jats:p>",
+    "<jats:title>Only a title</jats:title>",
+    "<jats:p>unclosed",
+    "<jats:p>Closed.</jats:p><jats:p>unclosed",
+    "<jats:p><![CDATA[x]]></jats:p>",
+    "Plain text without any tags",
+    "",
+]
+
+
+@pytest.mark.parametrize("abstract", ABSTRACTS)
+def test_clean_jats_abstract_matches_beautifulsoup(abstract):
+    assert crossref.clean_jats_abstract(abstract) == (
+        crossref.remove_xml_from_abstract(abstract)
+    )
+
+
+def test_clean_jats_abstract_keeps_nested_paragraph_text():
+    abstract = ABSTRACTS[3]
+    assert crossref.clean_jats_abstract(abstract) == "Outer inner tail inner"
+
+
+def test_remove_xml_from_abstracts_keeps_missing_abstracts():
+    abstracts = pd.Series([ABSTRACTS[0], None], index=[3, 7])
+    cleaned = crossref.remove_xml_from_abstracts(abstracts)
+    assert cleaned.tolist() == ["One paragraph.", None]
+    assert cleaned.index.tolist() == [3, 7]
+
+
+def test_iter_works_by_issn_resumes_restarted_cursor_with_its_query(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(crossref, "CHECKPOINT_DIRECTORY", tmp_path)
+    urls = []
+
+    def request_crossref(url, timeout, use_cache=True):
+        urls.append(url)
+        n = len(urls)
+        indexed = {"date-time": f"2024-01-0{n}T00:00:00Z"}
+        work = {"DOI": f"10.1/{n}", "indexed": indexed}
+        return {"items": [work], "next-cursor": f"cursor{n}"}
+
+    monkeypatch.setattr(crossref, "request_crossref", request_crossref)
+
+    next(crossref.iter_works_by_issn("1234-5678", 2000))
+
+    # Expire the saved cursor, so the pull restarts from the last index date
+    state_file, _ = crossref.get_checkpoint_files("1234-5678")
+    state = json.loads(state_file.read_text(encoding="utf8"))
+    state["updated"] = 0.0
+    state_file.write_text(json.dumps(state), encoding="utf8")
+    pages = crossref.iter_works_by_issn("1234-5678", 2000)
+    next(pages)
+    next(pages)
+    assert "from-index-date:2024-01-01" in urls[-1]
+
+    # Resuming pairs the restarted query with its own cursor
+    pages = crossref.iter_works_by_issn("1234-5678", 2000)
+    next(pages)
+    next(pages)
+    assert "from-index-date:2024-01-01" in urls[-1]
+    assert "cursor=cursor2" in urls[-1]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        assert self.status_code < 400
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers, timeout):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+
+def test_request_crossref_uses_cached_message_when_not_modified(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(crossref, "CACHE_DIRECTORY", tmp_path)
+    message = {"items": [{"DOI": "10.1/1"}], "total-results": 1}
+    session = FakeSession(
+        [
+            FakeResponse(200, {"status": "ok", "message": message}, {"ETag": '"v1"'}),
+            FakeResponse(304),
+        ]
+    )
+    monkeypatch.setattr(crossref, "get_session", lambda: session)
+
+    url = "https://api.crossref.org/works?query.author=A+B"
+    assert crossref.request_crossref(url, timeout=5) == message
+    assert crossref.request_crossref(url, timeout=5) == message
+    assert session.requests[0][1] == {}
+    assert session.requests[1][1] == {"If-None-Match": '"v1"'}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_iter_cursor_pages_skips_cursor_when_one_page_holds_all_results(
+    monkeypatch,
+):
+    urls = []
+
+    def request_crossref(url, timeout, use_cache=True):
+        urls.append((url, use_cache))
+        return {"items": [{"DOI": "10.1/1"}], "total-results": 1}
+
+    monkeypatch.setattr(crossref, "request_crossref", request_crossref)
+
+    pages = list(crossref.iter_cursor_pages("https://api.crossref.org/works?q", 5))
+    assert pages == [[{"DOI": "10.1/1"}]]
+    assert len(urls) == 1
+    assert "cursor=" not in urls[0][0] and urls[0][1]
@@ -0,0 +1,119 @@
+"""Tests for src.ollama_client against a stub Ollama server"""
+
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.ollama_client as oc
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Answers /api/embed with each text's number as its embedding
+
+    Statuses queued in server.failures are returned (one per request) before
+    requests succeed.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.batches.append(body["input"])
+            status = self.server.failures.pop(0) if self.server.failures else 200
+
+        if status != 200:
+            self.send_response(status)
+            self.end_headers()
+            return
+
+        # Finish out of order (not time.sleep, which the backoff tests patch)
+        threading.Event().wait(random.uniform(0, 0.02))
+        response = json.dumps(
+            {"embeddings": [[float(text)] for text in body["input"]]}
+        ).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    server.lock = threading.Lock()
+    server.batches = []
+    server.failures = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Record the backoff waits instead of sleeping"""
+    waits = []
+    monkeypatch.setattr(oc.time, "sleep", waits.append)
+    return waits
+
+
+def get_client(server, **kwargs):
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    return oc.OllamaEmbedClient("stub", host=host, **kwargs)
+
+
+def test_embed_keeps_input_order_across_concurrent_batches(server):
+    texts = [str(i) for i in range(200)]
+    with get_client(server, max_concurrency=4, batch_size=8) as client:
+        embeddings = client.embed(texts)
+
+    assert embeddings == [[float(i)] for i in range(200)]
+    assert len(server.batches) > 1
+    assert sorted(t for batch in server.batches for t in batch) == sorted(texts)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_embed_batch_retries_with_jittered_backoff(server, backoffs, status):
+    server.failures = [status, status]
+    with get_client(server) as client:
+        assert client.embed_batch(["1", "2"]) == [[1.0], [2.0]]
+
+    assert len(server.batches) == 3
+    assert len(backoffs) == 2
+    for attempt, wait in enumerate(backoffs, start=1):
+        assert 0 <= wait <= min(oc.BACKOFF_MAX, oc.BACKOFF_BASE * 2**attempt)
+
+
+def test_batch_size_halves_after_failure_and_grows_after_fast_response(
+    server, backoffs
+):
+    with get_client(server, batch_size=8, target_latency=60) as client:
+        server.failures = [503]
+        sizes = []
+        original = client.adapt_batch_size
+
+        def adapt_batch_size(latency):
+            original(latency)
+            sizes.append(client.batch_size)
+
+        client.adapt_batch_size = adapt_batch_size
+        client.embed_batch(["1"])
+
+    assert sizes == [4, 12]
+
+
+def test_embed_batch_raises_after_max_retries(server, backoffs):
+    server.failures = [503] * 10
+    with get_client(server, max_retries=2) as client:
+        with pytest.raises(RuntimeError, match="failed 3 times"):
+            client.embed_batch(["1"])
+
+    assert len(server.batches) == 3
+    assert len(backoffs) == 2
@@ -0,0 +1,47 @@
+"""Tests for src.preprocessing"""
+
+import pandas as pd
+
+import src.preprocessing as pp
+
+
+def test_clean_noncontent_statements_keeps_missing_abstracts_missing():
+    texts = pd.Series(["An abstract about firms.", None], index=[4, 9])
+    cleaned, hits = pp.clean_noncontent_statements(texts)
+    assert cleaned[4] == "An abstract about firms."
+    assert pd.isna(cleaned[9])
+    assert cleaned.index.tolist() == [4, 9]
+    assert len(hits) == len(pp.get_noncontent_regexes())
+
+
+def test_preprocess_texts_compacts_cache_to_current_texts(tmp_path, monkeypatch):
+    monkeypatch.setattr(pp, "get_nlp_cache_directory", lambda *args: tmp_path)
+    monkeypatch.setattr(pp, "MAX_NLP_CACHE_PARTS", 2)
+    monkeypatch.setattr(pp, "load_nlp", lambda: None)
+    monkeypatch.setattr(pp, "parse_texts", lambda nlp, texts: list(texts))
+    parsed = []
+
+    def preprocess_docs(docs, *args):
+        parsed.extend(docs)
+        return [doc.split() for doc in docs]
+
+    monkeypatch.setattr(pp, "preprocess_docs", preprocess_docs)
+
+    assert pp.preprocess_texts(pd.Series(["a b", "old"]), True, True, True) == [
+        ["a", "b"],
+        ["old"],
+    ]
+    pp.preprocess_texts(pd.Series(["a b", "c"]), True, True, True)
+    assert len(list(tmp_path.glob("part-*.parquet"))) == 2
+
+    # A third part would go over the limit, so the cache is compacted
+    tokens = pp.preprocess_texts(pd.Series(["c", "a b", "d"]), True, True, True)
+    assert tokens == [["c"], ["a", "b"], ["d"]]
+    assert parsed == ["a b", "old", "c", "d"]
+    parts = list(tmp_path.glob("part-*.parquet"))
+    assert len(parts) == 1
+    assert sorted(pd.read_parquet(parts[0])["Tokens"].map(list).map(" ".join)) == [
+        "a b",
+        "c",
+        "d",
+    ]
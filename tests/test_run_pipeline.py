@@ -0,0 +1,32 @@
+"""Tests for run_pipeline"""
+
+import dataclasses
+
+import run_pipeline
+import src.config as cfg
+
+
+def test_stage_tokens_only_change_for_stages_reading_a_setting(monkeypatch):
+    config = cfg.get_config()
+    tokens = run_pipeline.get_stage_tokens()
+
+    changed = dataclasses.replace(config, test_query=config.test_query + "?")
+    monkeypatch.setattr(cfg, "get_config", lambda: changed)
+    new_tokens = run_pipeline.get_stage_tokens()
+
+    assert new_tokens["collect"] == tokens["collect"]
+    assert new_tokens["preprocess"] == tokens["preprocess"]
+    assert new_tokens["embeddings"] != tokens["embeddings"]
+
+
+def test_run_token_changes_with_the_datasets(tmp_path):
+    dataset = tmp_path / "journal_publications"
+    dataset.mkdir()
+    (dataset / "part-0.parquet").write_bytes(b"one")
+    stage = run_pipeline.Stage("report", "report.py", datasets=(dataset,))
+
+    token = run_pipeline.get_run_token(stage, "token")
+    assert run_pipeline.get_run_token(stage, "token") == token
+
+    (dataset / "part-1.parquet").write_bytes(b"two")
+    assert run_pipeline.get_run_token(stage, "token") != token